@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, cpu_count
+from sklearn.base import clone
+from sklearn.model_selection import GroupKFold, StratifiedKFold
+from sklearn.metrics import accuracy_score, balanced_accuracy_score, f1_score, top_k_accuracy_score
+
+FOLD_CACHE_DIR = "cv_folds"
+
+
+# ==== 1) Fold schemes ====
+def temporal_folds(keys, min_train=1):
+    """Expanding window: train on all earlier values of `keys` (e.g. survey year), test on the next one"""
+    values = np.sort(pd.unique(keys[~pd.isna(keys)]))
+    folds = []
+    for i in range(min_train, len(values)):
+        train = np.flatnonzero(keys < values[i])
+        test = np.flatnonzero(keys == values[i])
+        if len(train) and len(test):
+            folds.append((train, test, str(values[i])))
+    return folds
+
+
+def cohort_folds(migration_year, edges=(1990, 2000, 2005, 2008, 2011, 2014), min_train=1):
+    """Bin migration_year into cohorts, then train on earlier cohorts and test on the next one"""
+    bins = np.digitize(np.asarray(migration_year, dtype=float), edges)
+    bins = np.where(np.isnan(np.asarray(migration_year, dtype=float)), -1, bins)
+    labels = [f"<{edges[0]}"] + [f"{a}-{b - 1}" for a, b in zip(edges, edges[1:])] + [f">={edges[-1]}"]
+    folds = []
+    for train, test, b in temporal_folds(np.where(bins < 0, np.nan, bins), min_train=min_train):
+        folds.append((train, test, labels[int(float(b))]))
+    return folds
+
+
+def group_folds(groups, n_splits=5):
+    """Grouped K-fold: one group (origin province, linked respondent) never appears in both train and test"""
+    groups = pd.Series(groups).fillna(-1).to_numpy()
+    n_splits = min(n_splits, len(np.unique(groups)))
+    splitter = GroupKFold(n_splits=n_splits)
+    return [(tr, te, f"fold{k}") for k, (tr, te) in
+            enumerate(splitter.split(np.zeros(len(groups)), groups=groups))]
+
+
+def random_folds(y, n_splits=5, seed=42):
+    """Stratified K-fold on the target, the cross-validated version of the old 80/20 split"""
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    return [(tr, te, f"fold{k}") for k, (tr, te) in enumerate(splitter.split(np.zeros(len(y)), y))]
+
+
+def make_folds(df, scheme, y=None, n_splits=5, cache_dir=FOLD_CACHE_DIR):
+    """
+    Materialize fold indices once and cache them on disk, so every model is scored on identical folds.
+    scheme: "year" (survey year), "cohort" (migration_year cohorts), "province" (origin hs_residence),
+            "respondent" (repeat respondents linked across waves stay in one fold), "random"
+    """
+    key_col = {"year": "year", "cohort": "migration_year", "province": "hs_residence",
+               "respondent": "respondent_cluster"}.get(scheme)
+    key = df[key_col].to_numpy() if key_col else np.asarray(y)
+    digest = hashlib.md5(pd.util.hash_array(pd.Series(key).astype(str).to_numpy()).tobytes()).hexdigest()[:12]
+    path = os.path.join(cache_dir, f"{scheme}_{n_splits}_{len(df)}_{digest}.npz")
+    if os.path.exists(path):
+        saved = np.load(path, allow_pickle=False)
+        names = json.loads(str(saved["names"]))
+        return [(saved[f"train{k}"], saved[f"test{k}"], n) for k, n in enumerate(names)]
+
+    if scheme == "year":
+        folds = temporal_folds(pd.to_numeric(df[key_col], errors="coerce").to_numpy())
+    elif scheme == "cohort":
+        folds = cohort_folds(pd.to_numeric(df[key_col], errors="coerce").to_numpy())
+    elif scheme in ("province", "respondent"):
+        folds = group_folds(df[key_col], n_splits=n_splits)
+    elif scheme == "random":
+        folds = random_folds(y, n_splits=n_splits)
+    else:
+        raise ValueError(f"Unknown CV scheme: {scheme}")
+    if not folds:
+        raise ValueError(f"CV scheme '{scheme}' produced no folds (need at least two distinct {key_col} values)")
+
+    os.makedirs(cache_dir, exist_ok=True)
+    arrays = {}
+    for k, (tr, te, _) in enumerate(folds):
+        arrays[f"train{k}"] = tr.astype(np.int32)
+        arrays[f"test{k}"] = te.astype(np.int32)
+    np.savez_compressed(path, names=json.dumps([n for _, _, n in folds]), **arrays)
+    return folds
+
+
+# ==== 2) Parallel evaluation ====
+def _fit_fold(model, X, y, train, test, name, sample_weight=None, fit_weight=None, fold_X=None):
+    start = time.perf_counter()
+    if fold_X is not None:
+        X = fold_X(train)  # features whose preprocessing (imputation) was fitted on this fold's train rows
+    fit_weight = sample_weight if fit_weight is None else fit_weight
+    fit_kw = {} if fit_weight is None else {"sample_weight": fit_weight[train]}
+    model.fit(X.iloc[train], y.iloc[train], **fit_kw)
+    fit_s = time.perf_counter() - start
+    y_true, y_pred = y.iloc[test], model.predict(X.iloc[test])
+    w = None if sample_weight is None else sample_weight[test]
+    row = {
+        "fold": name,
+        "n_train": len(train),
+        "n_test": len(test),
+        "accuracy": accuracy_score(y_true, y_pred, sample_weight=w),
+        "balanced_accuracy": balanced_accuracy_score(y_true, y_pred, sample_weight=w),
+        "macro_f1": f1_score(y_true, y_pred, average="macro", zero_division=0, sample_weight=w),
+        "fit_seconds": fit_s,
+    }
+    if hasattr(model, "predict_proba") and len(model.classes_) > 3:
+        proba = model.predict_proba(X.iloc[test])
+        seen = np.isin(y_true, model.classes_)  # classes unseen in training cannot be ranked
+        if seen.any():
+            row["top3_accuracy"] = top_k_accuracy_score(
+                y_true[seen], proba[seen], k=3, labels=model.classes_,
+                sample_weight=None if w is None else w[seen])
+    return row
+
+
+def cross_validate(model, X, y, folds, n_cores=-1, sample_weight=None, fit_weight=None, fold_X=None):
+    """
+    Fit a clone of `model` on every fold in parallel and return (per-fold table, summary).
+    n_cores is the total core budget: folds run side by side and each model gets the remaining cores
+    (its n_jobs: worker processes for the forest, OpenMP threads for the boosting backend).
+    sample_weight weights the metrics (and the fit, unless fit_weight is given).
+    fold_X(train) -> features for all rows, when preprocessing must be fitted per fold instead of using X.
+    """
+    budget = cpu_count() if n_cores in (-1, None) else max(1, n_cores)
+    outer = max(1, min(len(folds), budget))
+    inner = max(1, budget // outer)
+    base = clone(model)
+    if "n_jobs" in base.get_params():
+        base.set_params(n_jobs=inner)
+    rows = Parallel(n_jobs=outer)(
+        delayed(_fit_fold)(clone(base), X, y, tr, te, name, sample_weight, fit_weight, fold_X)
+        for tr, te, name in folds
+    )
+    per_fold = pd.DataFrame(rows)
+    metrics = per_fold.drop(columns=["fold", "n_train", "n_test"])
+    summary = pd.DataFrame({"mean": metrics.mean(), "std": metrics.std(ddof=0)})
+    return per_fold, summary
+
+
+def write_report(per_fold, summary, path, title="Cross-validation"):
+    with open(path, "w") as f:
+        f.write(f"{title}\n\nPer fold:\n")
+        f.write(per_fold.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+        f.write("\n\nSummary:\n")
+        f.write(summary.to_string(float_format=lambda v: f"{v:.4f}"))
+        f.write("\n")
@@ -15,13 +15,23 @@ import os
 current_dir = os.path.dirname(__file__)
 file_path = os.path.join(current_dir, "2011年个人数据(STATA).dta")
 
-# Read file
-df = pd.read_stata(file_path, convert_categoricals=False)
-print(f"✔ Loaded {file_path}")
+# Read only the columns this script uses: the canonical columns resolved by schema_catalog.py
+# (header-only, cached) plus the raw 2011 names handled below, in chunks. Names stay raw.
+import sys
+sys.path.insert(0, os.path.join(current_dir, "..", "..", "data merge", "derive_map"))
+from schema_catalog import read_projected
+extra_columns = [
+    "city", "pro_code", "pro_name",
+    "q101b1", "q101c1", "q101e1", "q101f1", "q101g1", "q101h1", "q101i1", "q101j1", "q101k2", "q101l2",
+    "q102", "q103", "q104", "q105", "q302", "q204", "q207", "q208", "q209", "q401", "q402", "q40331",
+    "q502a", "q502b", "q502c", "q502d", "q502e", "q502f", "q5101", "q5102", "q5103", "q5104", "q5105",
+]
+df = read_projected(file_path, extra=extra_columns)
+print(f"✔ Loaded {file_path} ({df.shape[1]} of the raw columns)")
 # Shanghai and Beijing Dummy
-df["city_clean"] = df["city"].astype(str).str.strip()
-df["is_beijing"] = (df["city_clean"] == "北京市").astype(int)
-df["is_shanghai"] = (df["city_clean"] == "上海市").astype(int)
+sys.path.insert(0, os.path.join(current_dir, "..", "name_index"))
+from name_index import add_place_columns  # shared city/province index: one lookup per distinct spelling
+add_place_columns(df, "city")  # city_clean, city_code (+ city_level), is_beijing, is_shanghai
 # Gender Dummy Male == 1 Female == 0
 df["male"] = (df["q101b1"] == 1).astype(int)
 print(df[["q101b1", "male"]].head(10))
@@ -29,6 +39,7 @@ print(df[["q101b1", "male"]].head(10))
 df["q101c1"] = df["q101c1"].astype(str).str.strip()
 df["birth_year"] = df["q101c1"].str[:4]
 df["birth_year"] = pd.to_numeric(df["birth_year"], errors="coerce")
+df["birth_month"] = pd.to_numeric(df["q101c1"].str[4:6], errors="coerce")  # used to link repeat respondents
 df["age"] = 2011 - df["birth_year"]
 df.loc[(df["age"] < 0) | (df["age"] > 120), "age"] = pd.NA  # Remove abnormal ages
 df["age"] = pd.to_numeric(df["age"], errors="coerce")
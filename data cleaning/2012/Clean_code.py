@@ -15,9 +15,6 @@ import os
 current_dir = os.path.dirname(__file__)
 file_path = os.path.join(current_dir, "2012年 个人数据 【全】.dta")
 
-# Read file
-df = pd.read_stata(file_path, convert_categoricals=False)
-print(f"✔ Loaded {file_path}")
 # ==== Standardize variable names: rename 2012 fields to match the 2011 code naming conventions ====
 rename_map = {
     # —— 101 (aligned with 2011 code usage) ——
@@ -70,6 +67,18 @@ rename_map = {
     "loca_despise":    "q5105",
 }
 
+# Read only the columns this script uses: the canonical columns resolved by schema_catalog.py
+# (header-only, cached) plus the raw 2012 names handled below, in chunks. Names stay raw.
+import sys
+sys.path.insert(0, os.path.join(current_dir, "..", "..", "data merge", "derive_map"))
+from schema_catalog import read_projected
+extra_columns = list(rename_map) + [
+    "city", "city_name", "pro_name", "pro_code",   # city_clean / is_beijing / is_shanghai
+    "q102a", "q102b", "q302_rent",                 # food / rent variants
+    "q502a", "q502b", "q502c", "q502d", "q502e", "q502f",
+]
+df = read_projected(file_path, extra=extra_columns)
+print(f"✔ Loaded {file_path} ({df.shape[1]} of the raw columns)")
 df.rename(columns={k: v for k, v in rename_map.items() if k in df.columns}, inplace=True)
 
 # Merge food expenditure into q102 (A+B)
@@ -108,13 +117,13 @@ print("✅ Completed 2012→2011 field renaming and unification.")
 # Shanghai & Beijing Dummy
 for cand in ["city", "city_name", "pro_name"]:
     if cand in df.columns:
-        df["city_clean"] = df[cand].astype(str).str.strip()
         break
 else:
     raise KeyError("No city / city_name / pro_name field found in the current file")
 
-df["is_beijing"] = df["city_clean"].str.contains("北京").astype(int)
-df["is_shanghai"] = df["city_clean"].str.contains("上海").astype(int)
+sys.path.insert(0, os.path.join(current_dir, "..", "name_index"))
+from name_index import add_place_columns  # shared city/province index: one lookup per distinct spelling
+add_place_columns(df, cand)  # city_clean, city_code (+ city_level), is_beijing, is_shanghai
 
 # Gender Dummy Male == 1 Female == 0
 sex_col = None
@@ -136,6 +145,7 @@ df["birth_year"] = df[birth_col].str[:4].astype(float)
 
 df["birth_year"] = df["q101c1"].str[:4]
 df["birth_year"] = pd.to_numeric(df["birth_year"], errors="coerce")
+df["birth_month"] = pd.to_numeric(df["q101c1"].str[4:6], errors="coerce")  # used to link repeat respondents
 df["age"] = 2011 - df["birth_year"]
 df.loc[(df["age"] < 0) | (df["age"] > 120), "age"] = pd.NA  # Remove abnormal ages
 df["age"] = pd.to_numeric(df["age"], errors="coerce")
@@ -15,9 +15,6 @@ import os
 current_dir = os.path.dirname(__file__)
 file_path = os.path.join(current_dir, "2013年个人数据.dta")
 
-# Read file
-df = pd.read_stata(file_path, convert_categoricals=False)
-print(f"✔ Loaded {file_path}")
 # =====================
 BASE_YEAR = 2013
 
@@ -61,6 +58,19 @@ rename_map = {
     "loca_despise":    "q5105",
     
 }
+# Read only the columns this script uses: the canonical columns resolved by schema_catalog.py
+# (header-only, cached) plus the raw 2013 names handled below, in chunks. Names stay raw.
+import sys
+sys.path.insert(0, os.path.join(current_dir, "..", "..", "data merge", "derive_map"))
+from schema_catalog import read_projected
+extra_columns = list(rename_map) + [
+    "birt_y_1", "birt_m_1", "a101c1", "q101c1",    # birth date parts
+    "city_name", "pro_name", "pro_code",           # city_clean / is_beijing / is_shanghai
+    "q102b", "q302b", "q101l2",                    # food / rent variants, spouse employment
+    "q502a", "q502b", "q502c", "q502d", "q502e", "q502f",
+]
+df = read_projected(file_path, extra=extra_columns)
+print(f"✔ Loaded {file_path} ({df.shape[1]} of the raw columns)")
 df.rename(columns={k: v for k,v in rename_map.items() if k in df.columns}, inplace=True)
 
 # 2) Combine birth year and month into q101c1 (birt_y_1 + birt_m_1)
@@ -72,6 +82,8 @@ elif "a101c1" in df.columns:
     df.rename(columns={"a101c1":"q101c1"}, inplace=True)
 elif "q101c1" not in df.columns:
     raise KeyError("Missing birth date columns (birt_y_1/birt_m_1/a101c1) in 2013 dataset")
+if "q101c1" in df.columns:
+    df["birth_month"] = pd.to_numeric(df["q101c1"].astype(str).str.strip().str[4:6], errors="coerce")  # used to link repeat respondents
 
 # 3) Combine migration year/month into q101j1 (q101j1_y + q101j1_m)
 if {"q101j1_y","q101j1_m"} <= set(df.columns):
@@ -159,6 +171,6 @@ if "q101l2" not in df.columns:
 # ===== City column setup for city_clean / is_beijing / is_shanghai =====
 city_col = "city_name" if "city_name" in df.columns else ("pro_name" if "pro_name" in df.columns else None)
 if city_col:
-    df["city_clean"] = df[city_col].astype(str).str.strip()
-    df["is_beijing"]  = df["city_clean"].str.contains("北京").astype(int)
-    df["is_shanghai"] = df["city_clean"].str.contains("上海").astype(int)
+    sys.path.insert(0, os.path.join(current_dir, "..", "name_index"))
+    from name_index import add_place_columns  # shared city/province index: one lookup per distinct spelling
+    add_place_columns(df, city_col)  # city_clean, city_code (+ city_level), is_beijing, is_shanghai
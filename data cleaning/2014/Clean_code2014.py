@@ -15,9 +15,6 @@ import os
 current_dir = os.path.dirname(__file__)
 file_path = os.path.join(current_dir, "2014年全国个人A卷.dta")
 
-# Read file
-df = pd.read_stata(file_path, convert_categoricals=False)
-print(f"✔ Loaded {file_path}")
 # ================= 2014 → 2011 Format: Unified Renaming =================
 rename_map = {
     # 101 (Person 1 = respondent)
@@ -53,6 +50,20 @@ rename_map = {
     "fer_numb":     "q402",
     "bir_place_1":  "q40331",
 }
+
+# Read only the columns this script uses: the canonical columns resolved by schema_catalog.py
+# (header-only, cached) plus the raw 2014 names handled below. Names stay raw; rename_map applies next.
+import sys
+sys.path.insert(0, os.path.join(current_dir, "..", "..", "data merge", "derive_map"))
+from schema_catalog import read_projected
+extra_columns = list(rename_map) + [
+    "birt_y_1", "birt_m_1", "a101c1",              # birth date parts
+    "city_name", "pro_name",                       # city_clean / is_beijing / is_shanghai
+    "money_home", "q510", "q102a", "q302_rent",    # remittance / food / rent variants
+    "q502a", "q502b", "q502c", "q502d", "q502e", "q502f",
+]
+df = read_projected(file_path, extra=extra_columns)
+print(f"✔ Loaded {file_path} ({df.shape[1]} of the raw columns)")
 df.rename(columns={k: v for k, v in rename_map.items() if k in df.columns}, inplace=True)
 
 # ===== Combine “year + month” into single columns for legacy compatibility =====
@@ -66,6 +77,8 @@ elif "a101c1" in df.columns:  # Rare variant
 else:
     # If missing, let later age logic handle it
     pass
+if "q101c1" in df.columns:
+    df["birth_month"] = pd.to_numeric(df["q101c1"].astype(str).str.strip().str[4:6], errors="coerce")  # used to link repeat respondents
 
 # Migration year/month: q101j1_y + q101j1_m → q101j1
 if {"q101j1_y","q101j1_m"} <= set(df.columns):
@@ -100,9 +113,9 @@ if "q101l2" not in df.columns:
 # ===== City column setup for city_clean/is_beijing/is_shanghai =====
 city_col = "city_name" if "city_name" in df.columns else ("pro_name" if "pro_name" in df.columns else None)
 if city_col:
-    df["city_clean"] = df[city_col].astype(str).str.strip()
-    df["is_beijing"]  = df["city_clean"].str.contains("北京").astype(int)
-    df["is_shanghai"] = df["city_clean"].str.contains("上海").astype(int)
+    sys.path.insert(0, os.path.join(current_dir, "..", "name_index"))
+    from name_index import add_place_columns  # shared city/province index: one lookup per distinct spelling
+    add_place_columns(df, city_col)  # city_clean, city_code (+ city_level), is_beijing, is_shanghai
 
 # Food expenditure: 2013 had a single column (Q215), merge if split into A/B
 if "q102" not in df.columns:
@@ -15,9 +15,39 @@ import os
 current_dir = os.path.dirname(__file__)
 file_path = os.path.join(current_dir, "a卷(STATA).dta")
 
-# Read file
-df = pd.read_stata(file_path, convert_categoricals=False)
-print(f"✔ Loaded {file_path}")
+# Read only the columns this script uses: the canonical columns resolved by schema_catalog.py
+# (header-only, cached) plus the raw 2015 names handled below, in chunks. Names stay raw.
+import sys
+sys.path.insert(0, os.path.join(current_dir, "..", "..", "data merge", "derive_map"))
+from schema_catalog import read_projected
+extra_columns = [
+    "ID", "q101h1",                                # sidecar (SIDECAR_COLUMNS below)
+    "Q102", "Q1021", "Q1022", "Q103", "Q104", "Q105", "Q106", "Q205", "Q206", "Q208", "Q209",
+    "Q201Y", "Q201M", "Q401", "Q401X", "Q402", "Q404D1", "Q305Y", "Q305M",
+    "q101c1y", "q101c1m", "a101c1", "q101k1y", "q101k1m",
+    "gender_1", "Q101B", "resi_place_1", "Q101E", "nation_1", "Q101F", "edu_stat_1", "edu_status_1", "Q101G",
+    "acc_nat_1", "acc_nature_1", "Q101H", "flo_rage_1", "Q101I", "mar_status_2", "emp_status_2",
+    "city_40", "F3", "F2", "pro", "pro_name", "pro_code",
+    "foodcost_m", "foodcost_m2", "money_home", "q510", "q102a", "q102b", "q302_rent",
+    "q502a", "q502b", "q502c", "q502d", "q502e", "q502f",
+]
+df = read_projected(file_path, extra=extra_columns)
+print(f"✔ Loaded {file_path} ({df.shape[1]} of the raw columns)")
+
+# ===== Sidecar columns: late-added raw fields kept from this single read =====
+# raw column → output column. Captured before any renaming so later steps cannot overwrite them,
+# and saved with ID as sidecar_2015.csv, which clean_2015_with_hs.csv.py joins onto clean_2015.csv.
+# Add new late fields here instead of re-reading the .dta file.
+SIDECAR_COLUMNS = {
+    "q101h1": "hs_residence_code",   # Hukou type code (previously re-read by clean_2015_with_hs.csv.py)
+}
+SIDECAR_KEY = "ID"
+sidecar_cols = [c for c in SIDECAR_COLUMNS if c in df.columns]
+sidecars = df[sidecar_cols].rename(columns=SIDECAR_COLUMNS)
+if SIDECAR_KEY in df.columns:
+    sidecar_path = os.path.join(current_dir, "sidecar_2015.csv")
+    df[[SIDECAR_KEY]].join(sidecars).to_csv(sidecar_path, index=False, encoding="utf-8-sig")
+    print(f"✔ Saved sidecar columns {list(sidecars.columns)} to: {sidecar_path}")
 # ===================== 2015 Adaptation Layer (based on provided column headers) =====================
 import numpy as np
 import pandas as pd
@@ -64,6 +94,8 @@ if {"q101c1y","q101c1m"} <= set(df.columns):
     df["q101c1"] = y.astype(str).str.replace("<NA>","") + m.astype(str).str.zfill(2).str.replace("<NA>","")
 elif "a101c1" in df.columns:
     df.rename(columns={"a101c1":"q101c1"}, inplace=True)
+if "q101c1" in df.columns:
+    df["birth_month"] = pd.to_numeric(df["q101c1"].astype(str).str.strip().str[4:6], errors="coerce")  # used to link repeat respondents
 
 # 3) Current migration time: if q101j1 is missing, combine q101k1y/q101k1m → q101j1
 if "q101j1" not in df.columns and {"q101k1y","q101k1m"} <= set(df.columns):
@@ -103,9 +135,9 @@ _ensure("q101l2", ["q101l2","emp_status_2"], fill=np.nan)  # 2015 lacks spouse e
 city_cands = [c for c in ["city_40","F3","F2","pro","pro_name"] if c in df.columns]
 if city_cands:
     cc = city_cands[0]
-    df["city_clean"]  = df[cc].astype(str).str.strip()
-    df["is_beijing"]  = df["city_clean"].str.contains("北京").astype(int)
-    df["is_shanghai"] = df["city_clean"].str.contains("上海").astype(int)
+    sys.path.insert(0, os.path.join(current_dir, "..", "name_index"))
+    from name_index import add_place_columns  # shared city/province index: one lookup per distinct spelling
+    add_place_columns(df, cc)  # city_clean, city_code (+ city_level), is_beijing, is_shanghai
 
 # 8) Working hours columns (q208/q209): ensure existence to avoid KeyError
 for c in ["q208","q209"]:
@@ -1,14 +1,17 @@
 import pandas as pd, os
 
 base = os.path.dirname(__file__)
-stata_path = os.path.join(base, "a卷(STATA).dta")
 clean_path = os.path.join(base, "clean_2015.csv")
+sidecar_path = os.path.join(base, "sidecar_2015.csv")  # written by Clean_code.py from its single read
 
-stata_df = pd.read_stata(stata_path, convert_categoricals=False)
 clean_df = pd.read_csv(clean_path, encoding="utf-8-sig")
 
-stata_sub = stata_df[["ID", "q101h1"]].rename(columns={"q101h1": "hs_residence_code"})
-merged = clean_df.merge(stata_sub, on="ID", how="left")
+if not os.path.exists(sidecar_path):
+    # no fallback to the .dta file: that would be the second full read this sidecar exists to avoid
+    raise FileNotFoundError(f"{sidecar_path} not found: re-run Clean_code.py, which writes it from its single read")
+sidecar = pd.read_csv(sidecar_path, encoding="utf-8-sig")
+new_cols = ["ID"] + [c for c in sidecar.columns if c != "ID" and c not in clean_df.columns]
+merged = clean_df.merge(sidecar[new_cols], on="ID", how="left")
 
 merged.to_csv(os.path.join(base, "clean_2015_with_hs.csv"), index=False, encoding="utf-8-sig")
 print("✔ Matched and saved as clean_2015_with_hs.csv")
@@ -0,0 +1,187 @@
+# ==== 1) Basic Libraries ====
+import os  # Handle file paths
+import re  # Regular expressions, used for suffix stripping
+import unicodedata  # Full-width → half-width normalization
+import numpy as np  # Numerical computation
+import pandas as pd  # Main library for data processing
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# GB/T 2260 code list (two columns: code,name): every prefecture-level unit, every county-level city and the
+# districts of the four municipalities, plus former names (襄樊市, 日喀则地区) under their current code.
+# Other counties and districts can be appended as rows; a code listed twice keeps its first name.
+REFERENCE_PATH = os.path.join(HERE, "admin_codes.csv")
+
+# ==== 2) Built-in tables ====
+# code: (official name, English name)
+PROVINCES = {
+    11: ("北京市", "Beijing"), 12: ("天津市", "Tianjin"), 13: ("河北省", "Hebei"), 14: ("山西省", "Shanxi"),
+    15: ("内蒙古自治区", "Inner Mongolia"), 21: ("辽宁省", "Liaoning"), 22: ("吉林省", "Jilin"),
+    23: ("黑龙江省", "Heilongjiang"), 31: ("上海市", "Shanghai"), 32: ("江苏省", "Jiangsu"),
+    33: ("浙江省", "Zhejiang"), 34: ("安徽省", "Anhui"), 35: ("福建省", "Fujian"), 36: ("江西省", "Jiangxi"),
+    37: ("山东省", "Shandong"), 41: ("河南省", "Henan"), 42: ("湖北省", "Hubei"), 43: ("湖南省", "Hunan"),
+    44: ("广东省", "Guangdong"), 45: ("广西壮族自治区", "Guangxi"), 46: ("海南省", "Hainan"),
+    50: ("重庆市", "Chongqing"), 51: ("四川省", "Sichuan"), 52: ("贵州省", "Guizhou"), 53: ("云南省", "Yunnan"),
+    54: ("西藏自治区", "Tibet"), 61: ("陕西省", "Shaanxi"), 62: ("甘肃省", "Gansu"), 63: ("青海省", "Qinghai"),
+    64: ("宁夏回族自治区", "Ningxia"), 65: ("新疆维吾尔自治区", "Xinjiang"),
+}
+
+# Extra spellings seen in the raw files
+ALIASES = {
+    "内蒙": 15, "广西自治区": 45, "宁夏自治区": 64, "新疆自治区": 65, "西藏区": 54,
+    "Xizang": 54, "Nei Mongol": 15, "Shensi": 61,
+}
+
+# Longest suffixes first, so "壮族自治区" is removed before "自治区"
+SUFFIXES = sorted(["省", "市", "自治区", "壮族自治区", "回族自治区", "维吾尔自治区", "特别行政区",
+                   "地区", "自治州", "盟", "新区", "区", "县", "自治县", "旗", "自治旗"], key=len, reverse=True)
+# Suffixes that may be dropped to reach a province / prefecture: "吉林市" is a city, not 吉林省,
+# and "西安区" (a district of Liaoyuan) is not 西安市
+LEVEL_SUFFIXES = {"province": ("省", "自治区", "特别行政区"), "prefecture": ("市", "地区", "自治州", "盟")}
+LEVEL_PRIORITY = {"province": 0, "prefecture": 1, "county": 2}
+_CJK = re.compile(r"[一-鿿]")
+
+
+# ==== 3) String normalization ====
+def repair_mojibake(s):
+    """GBK bytes decoded with the wrong codec (2013 files show e.g. 'ũҵ' for '农业'); undo it if the result is Chinese"""
+    if _CJK.search(s) or s.isascii():
+        return s
+    # single-byte looking text was decoded as latin-1/cp1252 (old Stata files), anything else as utf-8
+    order = ("latin-1", "cp1252", "utf-8") if max(map(ord, s)) < 256 else ("utf-8", "cp1252")
+    for wrong in order:
+        try:
+            fixed = s.encode(wrong).decode("gbk")
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            continue
+        if _CJK.search(fixed):
+            return fixed
+    return s
+
+
+def normalize(s):
+    raw = str(s)
+    # NFKC first, so full-width text (ｓｈａｎｇｈａｉ, １１) becomes ASCII instead of being "repaired" into fake CJK
+    s = unicodedata.normalize("NFKC", raw)
+    if not (s.isascii() or _CJK.search(s)):
+        # still neither ASCII nor Chinese: mojibake, repaired from the original code points
+        s = unicodedata.normalize("NFKC", repair_mojibake(raw))
+    return re.sub(r"\s+", "", s).strip().lower()
+
+
+def strip_suffix(name):
+    for suf in SUFFIXES:
+        if name.endswith(suf) and len(name) - len(suf) >= 2:
+            return name[: -len(suf)]
+    return name
+
+
+# ==== 4) Index ====
+class NameIndex:
+    """Lookup table: normalized name / alias / code string → (6-digit code, canonical name, level)"""
+
+    def __init__(self, reference_path=REFERENCE_PATH):
+        self.entries = {}  # code → (canonical name, level)
+        self.lookup = {}  # key → code
+        self.full_names = set()  # normalized official names with suffix ("海南省", "北京市")
+        for code, (name, english) in PROVINCES.items():
+            self.add(code * 10000, name, "province", extra=[english, str(code)])
+        if reference_path and os.path.exists(reference_path):
+            ref = pd.read_csv(reference_path, dtype={"code": str})
+            for code, name in zip(ref["code"], ref["name"]):
+                code = int(str(code)[:6])
+                level = "province" if code % 10000 == 0 else "prefecture" if code % 100 == 0 else "county"
+                self.add(code, str(name), level)
+        for alias, pro in ALIASES.items():
+            self.lookup.setdefault(normalize(alias), pro * 10000)
+
+    def add(self, code, name, level, extra=()):
+        self.entries.setdefault(code, (name, level))
+        if level != "county":
+            self.full_names.add(normalize(name))
+        keys = [name, strip_suffix(name), str(code), *extra]
+        if level == "prefecture":
+            keys.append(str(code // 100))  # 4-digit prefecture codes
+        for key in keys:
+            key = normalize(key)
+            current = self.lookup.get(key)
+            # a short form shared by several places keeps the higher-level one (province > prefecture > county)
+            if current is None or LEVEL_PRIORITY[level] < LEVEL_PRIORITY[self.entries[current][1]]:
+                self.lookup[key] = code
+
+    def lookup_stripped(self, key):
+        """Lookup without the administrative suffix, if that suffix fits the level found (LEVEL_SUFFIXES)"""
+        short = strip_suffix(key)
+        code = self.lookup.get(short) if short != key else None
+        if not code or not key.endswith(LEVEL_SUFFIXES.get(self.entries[code][1], ("",))):
+            return 0
+        return code
+
+    def resolve_one(self, value):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return 0
+        if isinstance(value, (int, np.integer, float, np.floating)):
+            value = str(int(value))
+        key = normalize(value)
+        code = self.lookup.get(key) or self.lookup_stripped(key)
+        if code:
+            return code
+        # "广东深圳" / "北京市朝阳区" / "北京朝阳" / "苏州工业园区": a leading province or prefecture name. The
+        # remainder wins when it resolves inside that province; otherwise the head counts if it is a full official
+        # name or is followed by a place name the index does not know (海南藏族自治州 and 河南县 are matched whole
+        # above, and a lone suffix as in "吉林市" or "西安区" is not a place name).
+        for prefix_len in range(min(len(key) - 1, 8), 1, -1):
+            head = self.lookup.get(key[:prefix_len])
+            if not head or self.entries[head][1] == "county":
+                continue
+            rest_key = key[prefix_len:]
+            rest = self.lookup.get(rest_key) or self.lookup_stripped(rest_key)
+            if rest and rest // 10000 == head // 10000:
+                return rest
+            if key[:prefix_len] in self.full_names or len(rest_key) >= 2:
+                return head
+        return 0
+
+    def resolve(self, values):
+        """
+        Resolve a whole column: factorize once, look up each distinct value once, broadcast back.
+        Returns code (6-digit, 0 = unknown), pro_code (2-digit, 0 = unknown), name (canonical), level.
+        """
+        values = pd.Series(values)
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        found = np.array([self.resolve_one(u) for u in uniques] + [0], dtype=np.int32)  # last slot: missing
+        code = found[codes]  # -1 (missing) picks the trailing 0
+        names = np.array([self.entries.get(c, (None, None))[0] for c in found], dtype=object)
+        levels = np.array([self.entries.get(c, (None, None))[1] for c in found], dtype=object)
+        return pd.DataFrame({
+            "code": code,
+            "pro_code": (code // 10000).astype(np.int16),
+            "name": names[codes],
+            "level": levels[codes],
+        }, index=values.index)
+
+
+_INDEXES = {}
+
+
+def resolve_names(values, reference_path=REFERENCE_PATH):
+    """Resolve a column with the shared index (built once per process and reference file)"""
+    if reference_path not in _INDEXES:
+        _INDEXES[reference_path] = NameIndex(reference_path)
+    return _INDEXES[reference_path].resolve(values)
+
+
+def add_place_columns(df, col, reference_path=REFERENCE_PATH):
+    """
+    Add city_clean, city_code, city_level, is_beijing and is_shanghai from the place column `col` (in place).
+    city_code can be a province, prefecture or county code (city_level says which); unresolved spellings keep
+    their own text and code 0, and for those the Beijing/Shanghai dummies fall back to a substring test.
+    """
+    raw = df[col].astype(str).str.strip()
+    places = resolve_names(df[col], reference_path)
+    unknown = places["code"] == 0
+    df["city_clean"] = places["name"].fillna(raw)
+    df["city_code"] = places["code"]
+    df["city_level"] = places["level"]
+    df["is_beijing"] = ((places["pro_code"] == 11) | (unknown & raw.str.contains("北京"))).astype(int)
+    df["is_shanghai"] = ((places["pro_code"] == 31) | (unknown & raw.str.contains("上海"))).astype(int)
+    return df
@@ -0,0 +1,200 @@
+# ==== 1) Basic Libraries ====
+import argparse  # Command line options
+from itertools import combinations  # Enumerate all dimension subsets
+import numpy as np  # Numerical computation
+import pandas as pd  # Main library for data processing
+
+# ==== 2) Cube configuration ====
+# Dimensions the reporting asks about; "education" is derived from the four education dummies
+DIMENSIONS = ["year", "pro_code", "rural", "education", "employment_group"]
+
+# Measures we report means / shares for (all additive once stored as sum, count, sum of squares)
+MEASURES = [
+    "income_total_m_win", "exp_total_m_win", "food_exp_m_win", "income_to_home_win", "rent_m_win",
+    "Pension_Insurance", "Medical_Insurance", "Work_Insurance",
+    "Unemploy_Insurance", "Maternity_Insurance", "Housing_Fund",
+    "Happiness", "Migrate_1", "Migrate_2", "Migrate_3",
+]
+
+# Education dummies → one ordinal label (rows with no dummy set are "none")
+EDU_LEVELS = ["high_school", "junior_college", "bachelor", "graduate"]
+
+# Suffixes of the additive statistics kept for every measure
+STATS = ("sum", "cnt", "ssq")
+
+
+def add_education(df):
+    """Collapse the education dummies into a single `education` dimension"""
+    if "education" in df.columns or not set(EDU_LEVELS) <= set(df.columns):
+        return df
+    dummies = df[EDU_LEVELS].fillna(0).to_numpy() == 1
+    labels = np.array(EDU_LEVELS + ["none"], dtype=object)
+    first = np.where(dummies.any(axis=1), dummies.argmax(axis=1), len(EDU_LEVELS))
+    df = df.copy()
+    df["education"] = labels[first]
+    return df
+
+
+def aggregate_chunk(df, dims, measures):
+    """One groupby pass over raw rows → additive base cuboid (finest grain over all dims)"""
+    df = add_education(df)
+    values = df[measures].apply(pd.to_numeric, errors="coerce")
+    parts = {"rows": pd.Series(1, index=df.index, dtype="int64")}
+    for m in measures:
+        v = values[m]
+        parts[m + "_sum"] = v.fillna(0)
+        parts[m + "_cnt"] = v.notna().astype("int64")
+        parts[m + "_ssq"] = (v * v).fillna(0)
+    wide = pd.DataFrame(parts)
+    keys = [df[d] for d in dims]
+    return wide.groupby(keys, dropna=False, observed=True, sort=False).sum()
+
+
+class AggregateCube:
+    """Additive aggregates (sum, count, sum of squares) for every subset of the configured dimensions"""
+
+    def __init__(self, base, dims, measures):
+        self.base = base  # finest cuboid, indexed by all dims
+        self.dims = list(dims)
+        self.measures = list(measures)
+        self.cuboids = {}
+
+    # ---------- building ----------
+    @classmethod
+    def from_frame(cls, df, dims=DIMENSIONS, measures=MEASURES):
+        measures = [m for m in measures if m in df.columns]
+        return cls(aggregate_chunk(df, dims, measures), dims, measures).materialize()
+
+    @classmethod
+    def from_csv(cls, path, dims=DIMENSIONS, measures=MEASURES, chunksize=500_000):
+        """Stream the panel CSV in chunks; chunk cuboids are combined by summation"""
+        header = pd.read_csv(path, nrows=0).columns
+        measures = [m for m in measures if m in header]
+        usecols = [c for c in header if c in set(dims) | set(measures) | set(EDU_LEVELS)]
+        partials = []
+        for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize, low_memory=False):
+            partials.append(aggregate_chunk(chunk, dims, measures))
+        base = pd.concat(partials).groupby(level=list(range(len(dims))), dropna=False, sort=False).sum()
+        base.index.names = list(dims)
+        return cls(base, dims, measures).materialize()
+
+    @classmethod
+    def merge(cls, cubes):
+        """Combine cubes built separately (e.g. one per year) without touching raw rows"""
+        cubes = list(cubes)
+        dims, measures = cubes[0].dims, cubes[0].measures
+        for c in cubes[1:]:
+            if c.dims != dims:
+                raise ValueError(f"Cannot merge cubes with different dimensions: {c.dims} vs {dims}")
+            measures = [m for m in measures if m in c.measures]
+        cols = ["rows"] + [f"{m}_{s}" for m in measures for s in STATS]
+        base = pd.concat([c.base[cols] for c in cubes])
+        base = base.groupby(level=list(range(len(dims))), dropna=False, sort=False).sum()
+        base.index.names = dims
+        return cls(base, dims, measures).materialize()
+
+    def materialize(self):
+        """Roll the base cuboid up into all 2^d cuboids (cheap: base is already aggregated)"""
+        self.cuboids = {}
+        for k in range(len(self.dims), -1, -1):
+            for subset in combinations(self.dims, k):
+                self.cuboids[subset] = self._rollup(subset)
+        return self
+
+    def _rollup(self, subset):
+        if len(subset) == len(self.dims):
+            return self.base
+        if not subset:
+            return self.base.sum().to_frame().T.astype(self.base.dtypes.to_dict())
+        # Roll up from the smallest already-built parent to keep every step small
+        parents = [p for p in self.cuboids if set(subset) < set(p)]
+        parent = min(parents, key=lambda p: len(self.cuboids[p])) if parents else tuple(self.dims)
+        source = self.cuboids.get(parent, self.base)
+        return source.groupby(level=list(subset), dropna=False, sort=False).sum()
+
+    # ---------- querying ----------
+    def query(self, by=(), where=None, measures=None, stats=("mean", "count")):
+        """
+        Slice / roll up the cube.
+        by      : dimensions to keep in the output (others are rolled up)
+        where   : {dim: value or list of values} filters applied before rolling up
+        stats   : any of "mean", "count", "sum", "std", "var"
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        where = where or {}
+        unknown = [d for d in by + list(where) if d not in self.dims]
+        if unknown:
+            raise KeyError(f"Unknown dimensions: {unknown}")
+        by = tuple(d for d in self.dims if d in by)
+        measures = [m for m in (measures or self.measures) if m in self.measures]
+        # Filtered dims must stay in the cuboid until the filter has been applied
+        grain = tuple(d for d in self.dims if d in by or d in where)
+        cube = self.cuboids.get(grain)
+        if cube is None:
+            cube = self._rollup(grain)
+        if where:
+            mask = np.ones(len(cube), dtype=bool)
+            for d, v in where.items():
+                values = v if isinstance(v, (list, tuple, set)) else [v]
+                mask &= cube.index.get_level_values(d).isin(list(values))
+            cube = cube[mask]
+            cube = cube.groupby(level=list(by), dropna=False).sum() if by else \
+                cube.sum().to_frame().T.astype(cube.dtypes.to_dict())
+        return self._finalize(cube, measures, stats)
+
+    @staticmethod
+    def _finalize(cube, measures, stats):
+        out = {"rows": cube["rows"]}
+        for m in measures:
+            s, n, q = cube[m + "_sum"], cube[m + "_cnt"], cube[m + "_ssq"]
+            mean = s / n.where(n > 0)
+            var = (q - n * mean ** 2) / (n - 1).where(n > 1)  # sample variance
+            for stat in stats:
+                if stat == "mean":
+                    out[m] = mean
+                elif stat == "count":
+                    out[m + "_n"] = n
+                elif stat == "sum":
+                    out[m + "_sum"] = s
+                elif stat == "var":
+                    out[m + "_var"] = var.clip(lower=0)
+                elif stat == "std":
+                    out[m + "_std"] = np.sqrt(var.clip(lower=0))
+                else:
+                    raise ValueError(f"Unknown statistic: {stat}")
+        return pd.DataFrame(out)
+
+    # ---------- storage ----------
+    def save(self, path):
+        """Only the base cuboid is stored (downcast, compressed); rollups are rebuilt on load"""
+        base = self.base.copy()
+        for c in base.columns:
+            if c.endswith("_cnt") or c == "rows":
+                base[c] = pd.to_numeric(base[c], downcast="unsigned")
+        pd.to_pickle({"dims": self.dims, "measures": self.measures, "base": base}, path, compression="gzip")
+
+    @classmethod
+    def load(cls, path):
+        obj = pd.read_pickle(path, compression="gzip")
+        base = obj["base"]
+        counts = [c for c in base.columns if c.endswith("_cnt") or c == "rows"]
+        base[counts] = base[counts].astype("int64")  # widen again so merged sums cannot overflow
+        return cls(base, obj["dims"], obj["measures"]).materialize()
+
+
+# ==== 3) Command line: build one cube per input CSV, or merge existing cubes ====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build / merge the descriptive statistics cube")
+    parser.add_argument("inputs", nargs="+", help="panel CSV files, or .cube.pkl.gz files with --merge")
+    parser.add_argument("-o", "--output", default="panel.cube.pkl.gz")
+    parser.add_argument("--merge", action="store_true", help="merge existing cubes instead of scanning CSVs")
+    parser.add_argument("--dims", nargs="+", default=DIMENSIONS)
+    args = parser.parse_args()
+
+    if args.merge:
+        cube = AggregateCube.merge(AggregateCube.load(p) for p in args.inputs)
+    else:
+        cube = AggregateCube.merge(AggregateCube.from_csv(p, dims=args.dims) for p in args.inputs)
+    cube.save(args.output)
+    print(f"✔ Cube with {len(cube.base)} base cells and {len(cube.cuboids)} cuboids saved to: {args.output}")
+    print(cube.query(by=["year"], measures=["income_total_m_win", "Migrate_1"]).head())
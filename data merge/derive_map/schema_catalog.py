@@ -0,0 +1,245 @@
+# ==== 1) Basic Libraries ====
+import os  # Handle file paths
+import re  # Regular expressions, used for field name normalization
+import json  # Cache headers and read derived_map.json
+import glob  # Find raw .dta files
+import argparse  # Command line options
+import difflib  # Fuzzy name matching
+import pandas as pd  # Main library for data processing
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(HERE, "schema_catalog.json")
+DERIVED_MAP_PATH = os.path.join(HERE, "derived_map.json")
+
+# ==== 2) Canonical schema (the 2011 q-code layout every cleaning script converges on) ====
+# aliases: raw names already seen in some wave; labels: keywords found in Stata variable labels
+CANONICAL = {
+    "q101b1":   {"aliases": ["gender_1", "Q101B"],                       "labels": ["性别"]},
+    "q101c1":   {"aliases": ["a101c1"],                                  "labels": ["出生年月"]},
+    "q101c1_y": {"aliases": ["birt_y_1", "q101c1y"],                     "labels": ["出生年"]},
+    "q101c1_m": {"aliases": ["birt_m_1", "q101c1m"],                     "labels": ["出生月"]},
+    "q101e1":   {"aliases": ["resi_place_1", "Q101E"],                   "labels": ["户口所在地", "户籍地"]},
+    "q101f1":   {"aliases": ["nation_1", "Q101F"],                       "labels": ["民族"]},
+    "q101g1":   {"aliases": ["edu_status_1", "edu_stat_1", "Q101G"],     "labels": ["受教育程度", "学历"]},
+    "q101h1":   {"aliases": ["acc_nature_1", "acc_nat_1", "Q101H"],      "labels": ["户口性质", "户籍性质"]},
+    "q101i1":   {"aliases": ["flo_rage_1", "Q101I"],                     "labels": ["流动范围"]},
+    "q101j1":   {"aliases": [],                                          "labels": ["本次流动时间"]},
+    "q101j1_y": {"aliases": ["floyear_1", "q101k1y"],                    "labels": ["流入本地年份", "流动年"]},
+    "q101j1_m": {"aliases": ["flomon_1", "q101k1m"],                     "labels": ["流入本地月份", "流动月"]},
+    "q101k2":   {"aliases": ["mar_status_2"],                            "labels": ["婚姻状况"]},
+    "q101l2":   {"aliases": ["emp_status_2"],                            "labels": ["就业状况"]},
+    "q102":     {"aliases": ["foodcost_m", "Q102"],                      "labels": ["食品支出", "伙食"]},
+    "q102b":    {"aliases": ["foodcost_m2"],                             "labels": []},
+    "q103":     {"aliases": ["cost_m", "Q103"],                          "labels": ["总支出"]},
+    "q104":     {"aliases": ["money_home", "q510"],                      "labels": ["寄回", "带回老家"]},
+    "q105":     {"aliases": ["famincom_m", "Q105"],                      "labels": ["总收入"]},
+    "q302":     {"aliases": ["rent_m", "Q104"],                          "labels": ["住房支出", "房租"]},
+    "q302b":    {"aliases": ["rent_m2"],                                 "labels": []},
+    "q203":     {"aliases": ["job_indu"],                                "labels": ["行业"]},
+    "q204":     {"aliases": ["unit_quality", "Q205"],                    "labels": ["单位性质"]},
+    "q207":     {"aliases": ["emly_ident", "emly_iden", "Q206"],         "labels": ["就业身份"]},
+    "q208":     {"aliases": ["aver_days", "Q208"],                       "labels": ["每周工作几天", "工作天数"]},
+    "q209":     {"aliases": ["aver_hours", "Q209"],                      "labels": ["每天工作几小时", "工作小时"]},
+    "q401":     {"aliases": ["Q401"],                                    "labels": ["初婚年月"]},
+    "q401_y":   {"aliases": ["firmarr_y", "Q305Y"],                      "labels": ["初婚年"]},
+    "q401_m":   {"aliases": ["firmarr_m", "Q305M"],                      "labels": ["初婚月"]},
+    "q402":     {"aliases": ["fer_numb", "Q402"],                        "labels": ["子女数", "孩子数"]},
+    "q40331":   {"aliases": ["bir_place_1", "Q404D1"],                   "labels": ["出生地"]},
+    "q502a":    {"aliases": [],                                          "labels": ["养老保险"]},
+    "q502b":    {"aliases": [],                                          "labels": ["医疗保险"]},
+    "q502c":    {"aliases": [],                                          "labels": ["工伤保险"]},
+    "q502d":    {"aliases": [],                                          "labels": ["失业保险"]},
+    "q502e":    {"aliases": [],                                          "labels": ["生育保险"]},
+    "q502f":    {"aliases": [],                                          "labels": ["住房公积金"]},
+    "q5101":    {"aliases": ["love_city"],                               "labels": ["喜欢"]},
+    "q5102":    {"aliases": ["atte_change"],                             "labels": ["变化"]},
+    "q5103":    {"aliases": ["loca_integrate"],                          "labels": ["融入"]},
+    "q5104":    {"aliases": ["loca_accept"],                             "labels": ["接受"]},
+    "q5105":    {"aliases": ["loca_despise"],                            "labels": ["看不起"]},
+}
+
+# Identifier / geography columns every wave keeps as-is (first hit wins per group in the scripts)
+KEEP_ALWAYS = ["ID", "id", "pro_code", "pro_name", "pro", "city", "city_name", "city_40", "F2", "F3", "county"]
+
+# Questionnaire codes (q101c1, Q205, a101c1, q101c1y, ...): matched exactly, by alias or by label only
+QCODE = re.compile(r"^[qa]\d+[a-z0-9_]*$", re.IGNORECASE)
+
+# Abbreviations that drift between waves; applied before fuzzy comparison
+_ABBREV = [("status", "stat"), ("nature", "nat"), ("ident", "iden"), ("number", "numb")]
+
+
+def normalize_name(name):
+    """Lower-case, drop separators and shorten the abbreviations that drift between waves"""
+    n = re.sub(r"[^0-9a-z]", "", str(name).lower())
+    for long, short in _ABBREV:
+        n = n.replace(long, short)
+    return n
+
+
+def repair_label(label):
+    """Old Stata files store GBK labels that pandas decodes as latin-1; undo that when possible"""
+    if not label or re.search(r"[一-鿿]", label):
+        return label
+    try:
+        return label.encode("latin-1").decode("gbk")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return label
+
+
+# ==== 3) Header-only reading with an on-disk cache ====
+def read_header(path):
+    """Variable names, storage types and labels of a .dta file; no data rows are read"""
+    with pd.io.stata.StataReader(path) as reader:
+        labels = reader.variable_labels()  # parses the header and label section only
+        types = getattr(reader, "_typlist", [None] * len(labels))
+        nobs = getattr(reader, "_nobs", None)
+    columns = []
+    for (name, label), typ in zip(labels.items(), types):
+        dtype = f"str{typ}" if isinstance(typ, int) else {
+            "b": "int8", "h": "int16", "l": "int32", "f": "float32", "d": "float64", "Q": "strL",
+        }.get(typ, str(typ))
+        columns.append({"name": name, "dtype": dtype, "label": repair_label(label)})
+    return {"nobs": nobs, "columns": columns}
+
+
+def _load_cache(cache_path=CACHE_PATH):
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def _save_cache(cache, cache_path=CACHE_PATH):
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=1)
+
+
+def header(path, cache_path=CACHE_PATH):
+    """Cached header; re-read only when the file's size or modification time changed"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    stamp = [stat.st_size, int(stat.st_mtime)]
+    cache = _load_cache(cache_path)
+    entry = cache.get(path)
+    if entry is None or entry.get("stamp") != stamp:
+        entry = {"stamp": stamp, **read_header(path)}
+        cache[path] = entry
+        _save_cache(cache, cache_path)
+    return entry
+
+
+def scan(root, cache_path=CACHE_PATH):
+    """Catalog every raw .dta below `root` (e.g. the `data cleaning` folder)"""
+    paths = sorted(glob.glob(os.path.join(root, "**", "*.dta"), recursive=True))
+    return {p: header(p, cache_path) for p in paths}
+
+
+# ==== 4) Resolve raw columns to canonical names ====
+def load_derived_map(path=DERIVED_MAP_PATH):
+    """original → standardized map exported by derive_map.ipynb (empty if not generated yet)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def resolve(path, canonical=CANONICAL, derived_map=None, fuzzy_cutoff=0.85, cache_path=CACHE_PATH):
+    """
+    Match the raw columns of one wave to canonical names.
+    Order: exact canonical name → derived_map.json → known alias → variable label → fuzzy name.
+    Returns {"rename": {raw: canonical}, "method": {canonical: how}, "missing": [...], "projection": [...]}
+    """
+    cols = header(path, cache_path)["columns"]
+    raw_names = [c["name"] for c in cols]
+    labels = {c["name"]: c["label"] or "" for c in cols}
+    derived_map = load_derived_map() if derived_map is None else derived_map
+
+    lower = {n.lower(): n for n in raw_names}
+    normalized = {}
+    for n in raw_names:
+        normalized.setdefault(normalize_name(n), n)
+    derived = {}
+    for raw, std in derived_map.items():
+        derived.setdefault(std, []).append(raw)
+
+    rename, method, taken = {}, {}, set()
+
+    def take(target, raw, how):
+        if raw is None or raw in taken:
+            return False
+        taken.add(raw)
+        rename[raw] = target
+        method[target] = how
+        return True
+
+    # Pass 1: exact, derived map, aliases (cheap and unambiguous)
+    for target, spec in canonical.items():
+        # exact match is case-sensitive: 2015 uses Q104 for rent while q104 means remittance
+        if take(target, target if target in labels else None, "exact"):
+            continue
+        if any(take(target, lower.get(r.lower()), "derived_map") for r in derived.get(target, [])):
+            continue
+        for alias in spec["aliases"]:
+            if take(target, lower.get(alias.lower()) or normalized.get(normalize_name(alias)), "alias"):
+                break
+
+    # Pass 2: variable labels, then fuzzy names, only for what is still unresolved
+    for target, spec in canonical.items():
+        if target in method:
+            continue
+        hit = next((n for n in raw_names if n not in taken and spec["labels"]
+                    and any(k in labels[n] for k in spec["labels"])), None)
+        if take(target, hit, "label"):
+            continue
+        # q-codes are never fuzzy-matched: q101c1y and q101j1y differ by one character but are unrelated questions
+        pool = {k: v for k, v in normalized.items() if v not in taken and not QCODE.match(v)}
+        for alias in [a for a in [target] + spec["aliases"] if not QCODE.match(a)]:
+            close = difflib.get_close_matches(normalize_name(alias), list(pool), n=1, cutoff=fuzzy_cutoff)
+            if close and take(target, pool[close[0]], "fuzzy"):
+                break
+
+    keep = [n for n in raw_names if n in KEEP_ALWAYS]
+    projection = [n for n in raw_names if n in rename or n in keep]
+    missing = [t for t in canonical if t not in method]
+    return {"rename": rename, "method": method, "missing": missing, "projection": projection}
+
+
+def read_projected(path, extra=(), rename=False, chunksize=100_000, cache_path=CACHE_PATH, **kwargs):
+    """
+    Read only the columns a cleaning script needs.
+    extra     : additional raw column names to keep (ignored if absent from the header)
+    rename    : apply the canonical rename map directly (new waves); existing scripts keep raw names
+    chunksize : rows per read; pd.read_stata(columns=...) alone builds the full frame before selecting,
+                so the file is read in chunks and only the projected columns of each chunk are kept
+    """
+    res = resolve(path, cache_path=cache_path, **kwargs)
+    present = {c["name"] for c in header(path, cache_path)["columns"]}
+    columns = res["projection"] + [c for c in extra if c in present and c not in res["projection"]]
+    with pd.read_stata(path, columns=columns, convert_categoricals=False, chunksize=chunksize) as reader:
+        df = pd.concat(list(reader), ignore_index=True)
+    if rename:
+        df = df.rename(columns=res["rename"])
+    return df
+
+
+# ==== 5) Command line ====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Header-only schema catalog of raw survey files")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_scan = sub.add_parser("scan", help="cache the headers of every .dta below a folder")
+    p_scan.add_argument("root")
+    p_res = sub.add_parser("resolve", help="print the rename map and column projection of one file")
+    p_res.add_argument("path")
+    args = parser.parse_args()
+
+    if args.cmd == "scan":
+        catalog = scan(args.root)
+        for p, entry in catalog.items():
+            print(f"✔ {p}: {len(entry['columns'])} columns, {entry['nobs']} rows")
+    else:
+        res = resolve(args.path)
+        for raw, target in sorted(res["rename"].items(), key=lambda kv: kv[1]):
+            print(f"{raw:>16} → {target:<10} ({res['method'][target]})")
+        print(f"Projection: {len(res['projection'])} columns")
+        if res["missing"]:
+            print("Not found:", ", ".join(res["missing"]))
@@ -0,0 +1,137 @@
+# ==== 1) Basic Libraries ====
+import os  # Handle file paths
+import re  # Regular expressions, used to parse "xxxx年" headers
+import argparse  # Command line options
+import numpy as np  # Numerical computation
+import pandas as pd  # Main library for data processing
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data cleaning", "name_index"))
+from name_index import resolve_names  # shared province/city name index (short forms, English names, mojibake)
+
+YEAR_COL = re.compile(r"^\s*(\d{4})\s*年?\s*$")
+
+
+# ==== 2) Reshaping ====
+def to_long(table, value_name, key="pro_code", name_col=None):
+    """
+    Bring one indicator table into long (key, year, value) format.
+    Wide tables have one column per year ("1992年", "1993年", ... or plain "1992");
+    long tables already carry a `year` column and a `value_name` column.
+    name_col: column with place names (e.g. "地区") to translate into `key` codes: 2-digit province codes
+              for key="pro_code", the 6-digit administrative code (as in the cleaned `city_code`) for any other key.
+    """
+    df = table.copy()
+    if name_col is not None:
+        places = resolve_names(df[name_col])
+        df[key] = places["pro_code" if key == "pro_code" else "code"].to_numpy()
+        unknown = df.loc[df[key] == 0, name_col].unique()
+        if len(unknown):
+            print(f"[warning] Place not found: {list(unknown)}")
+        df = df[df[key] > 0]
+    if "year" in df.columns:
+        return df[[key, "year", value_name]]
+    year_cols = [c for c in df.columns if YEAR_COL.match(str(c))]
+    if not year_cols:
+        raise KeyError(f"No year columns or `year` column found for {value_name}")
+    long = df.melt(id_vars=[key], value_vars=year_cols, var_name="year", value_name=value_name)
+    long["year"] = long["year"].astype(str).str.extract(YEAR_COL, expand=False).astype(int)
+    long[value_name] = pd.to_numeric(long[value_name], errors="coerce")
+    return long
+
+
+# ==== 3) Grouped, vectorized fill policies ====
+def _group_bounds(values, groups):
+    """Group id of the previous and next observed value for every row (rows are sorted by key, year)"""
+    valid = values.notna()
+    prev_grp = groups.where(valid).ffill()
+    next_grp = groups.where(valid).bfill()
+    return prev_grp, next_grp
+
+
+def apply_fill(s, groups, policy, years=None):
+    """
+    Fill one column within key groups without a Python loop over groups.
+    policy: "bfill" (earlier years take the first observed value, e.g. 1980–1991 ← 1992),
+            "ffill" (later years keep the last observed value), "both" (bfill then ffill),
+            "interpolate" (linear between observed years inside a group), or a number (constant fill).
+    """
+    if policy is None:
+        return s
+    if policy in ("bfill", "ffill", "both"):
+        grouped = s.groupby(groups, sort=False)
+        if policy == "bfill":
+            return grouped.bfill()
+        if policy == "ffill":
+            return grouped.ffill()
+        return grouped.bfill().groupby(groups, sort=False).ffill()
+    if policy == "interpolate":
+        # Monotonic x across the stacked groups so one interpolate call covers every group
+        step = np.arange(len(s)) if years is None else np.asarray(years, dtype=float)
+        x = pd.factorize(groups)[0] * 10_000 + step
+        filled = pd.Series(s.to_numpy(dtype=float), index=x).interpolate(method="index", limit_area="inside")
+        filled.index = s.index
+        prev_grp, next_grp = _group_bounds(s, groups)
+        # Only keep values interpolated between two observations of the same group
+        inside = prev_grp.eq(next_grp) & prev_grp.eq(groups)
+        return s.where(s.notna() | ~inside, filled)
+    if np.isscalar(policy):
+        return s.fillna(policy)
+    raise ValueError(f"Unknown fill policy: {policy}")
+
+
+# ==== 4) Panel builder ====
+def build_panel(indicators, years=range(1980, 2018), key="pro_code", fill=None, keys=None):
+    """
+    indicators: {column name: long table from `to_long`} (any number of province- or city-level tables)
+    fill      : {column name: policy} – see `apply_fill`; columns not listed are left as-is
+    keys      : explicit key universe; defaults to the union of keys in all tables
+    Returns one (key, year)-sorted table with compact dtypes, ready for fast joins.
+    """
+    fill = fill or {}
+    if keys is None:
+        keys = pd.unique(pd.concat([t[key] for t in indicators.values()], ignore_index=True).dropna())
+    # Build the key × year skeleton once
+    idx = pd.MultiIndex.from_product([np.sort(np.asarray(keys)), list(years)], names=[key, "year"])
+    panel = pd.DataFrame(index=idx)
+    for name, table in indicators.items():
+        values = table.dropna(subset=[key]).drop_duplicates([key, "year"], keep="last")
+        values = values.set_index([key, "year"])[name]
+        panel[name] = values.reindex(idx)
+    panel = panel.reset_index()
+
+    groups = panel[key]
+    for name, policy in fill.items():
+        panel[name] = apply_fill(panel[name], groups, policy, years=panel["year"])
+
+    panel[key] = pd.to_numeric(panel[key], downcast="integer")
+    panel["year"] = panel["year"].astype("int16")
+    return panel
+
+
+# ==== 5) Command line: reproduce china_panel.xlsx from the GDP / CPI sheets ====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a province × year covariate panel")
+    parser.add_argument("tables", nargs="+", help="NAME=FILE[:POLICY], e.g. GDP=gdp分省年度数据.xls:bfill")
+    parser.add_argument("--key", default="pro_code", help="key column (pro_code, or a city code column)")
+    parser.add_argument("--name-col", default="地区", help="column with province names in wide tables")
+    parser.add_argument("--start", type=int, default=1980)
+    parser.add_argument("--end", type=int, default=2017)
+    parser.add_argument("-o", "--output", default="china_panel.xlsx")
+    args = parser.parse_args()
+
+    indicators, fill = {}, {}
+    for spec in args.tables:
+        name, rest = spec.split("=", 1)
+        path, _, policy = rest.partition(":")
+        raw = pd.read_excel(path) if path.endswith((".xls", ".xlsx")) else pd.read_csv(path)
+        name_col = args.name_col if args.name_col in raw.columns and args.key not in raw.columns else None
+        indicators[name] = to_long(raw, name, key=args.key, name_col=name_col)
+        if policy:
+            fill[name] = float(policy) if re.fullmatch(r"-?\d+(\.\d+)?", policy) else policy
+
+    panel = build_panel(indicators, years=range(args.start, args.end + 1), key=args.key, fill=fill)
+    if args.output.endswith((".xls", ".xlsx")):
+        panel.to_excel(args.output, index=None)
+    else:
+        panel.to_csv(args.output, index=None, encoding="utf-8-sig")
+    print(f"✔ {len(panel)} rows ({panel[args.key].nunique()} keys) saved to: {args.output}")
@@ -0,0 +1,208 @@
+# ==== 1) Basic Libraries ====
+import argparse  # Command line options
+import numpy as np  # Numerical computation
+import pandas as pd  # Main library for data processing
+from scipy.sparse import coo_matrix  # Link graph
+from scipy.sparse.csgraph import connected_components  # Clusters of linked rows
+
+# ==== 2) Linkage configuration ====
+# Blocking passes: candidates are only compared inside blocks that agree on all keys of a pass.
+# The first pass is the strict key; the second tolerates a misreported migration year.
+BLOCKING_PASSES = [
+    ["birth_year", "male", "hs_residence", "is_han", "migration_year", "pro_code"],
+    ["birth_year", "male", "hs_residence", "is_han", "pro_code", "city_clean"],
+]
+MAX_BLOCK = 500  # larger blocks (the most common profiles) are split on SUB_BLOCK_KEYS until they fit
+SUB_BLOCK_KEYS = ["marriage_year", "city_clean", "kids_number", "birth_month"]
+
+EDU_COLS = ["high_school", "junior_college", "bachelor", "graduate"]
+
+# Comparison weights; a pair is linked when its weighted agreement share reaches THRESHOLD.
+# Comparisons on a key the pair was blocked on are skipped: they agree by construction.
+WEIGHTS = {
+    "birth_month": 3.0,        # same birth month (from birth_month or the YYYYMM q101c1)
+    "marriage_year": 2.0,      # same first-marriage year
+    "migration_year": 2.0,     # same year of arrival
+    "income": 1.0,             # monthly income within a factor of ~1.6
+    "kids_number": 0.5,        # children never decrease, and not by more than 3
+    "rural": 0.5,              # hukou type does not change
+    "education": 0.5,          # education level never decreases
+    "marriage": 0.5,           # married status never reverts
+    "city_clean": 0.5,         # same current city
+    "employment_group": 0.5,   # same employment group
+}
+# Fixed personal facts: at least one must be observed and agree, and none may disagree.
+# The other comparisons have a handful of levels and cannot tell two people apart on their own.
+DISCRIMINATING = ["birth_month", "marriage_year", "migration_year"]
+# Calibrated on sample.csv with random wave labels (no planted repeats): multi-wave rows drop from
+# ~18% to ~2%, and those left are records identical on every compared field. 92% of planted
+# repeats (income, kids and employment perturbed) are still linked; results are flat over 0.7–0.85.
+THRESHOLD = 0.8
+
+
+def education_level(df):
+    """0 = none, 1..4 = highest education dummy set"""
+    if not set(EDU_COLS) <= set(df.columns):
+        return pd.Series(np.nan, index=df.index)
+    d = df[EDU_COLS].fillna(0).to_numpy() == 1
+    return pd.Series(np.where(d.any(axis=1), d.argmax(axis=1) + 1, 0), index=df.index)
+
+
+def birth_month(df):
+    """Birth month from `birth_month`, else from the YYYYMM `q101c1`; NaN when unknown"""
+    if "birth_month" in df.columns:
+        m = pd.to_numeric(df["birth_month"], errors="coerce")
+    elif "q101c1" in df.columns:
+        m = pd.to_numeric(df["q101c1"].astype(str).str.strip().str[4:6], errors="coerce")
+    else:
+        return pd.Series(np.nan, index=df.index)
+    return m.where(m.between(1, 12))
+
+
+def block_ids(df, keys):
+    """Integer block id per row for one blocking pass (-1 where any key is missing)"""
+    keys = [k for k in keys if k in df.columns]
+    ids = df.groupby(keys, dropna=True, sort=False).ngroup()
+    return ids.where(df[keys].notna().all(axis=1), -1).astype(np.int64)
+
+
+def split_large_blocks(df, ids, max_block=MAX_BLOCK, sub_keys=SUB_BLOCK_KEYS):
+    """Split blocks above `max_block` on one more key at a time (a missing value is its own level)"""
+    ids = ids.to_numpy().copy()
+    extra = {"birth_month": birth_month(df)}
+    for key in sub_keys:
+        counts = np.bincount(ids[ids >= 0]) if (ids >= 0).any() else np.zeros(0, int)
+        big = (ids >= 0) & (counts[np.maximum(ids, 0)] > max_block) if len(counts) else np.zeros(len(ids), bool)
+        if not big.any():
+            break
+        values = extra[key] if key in extra else df[key] if key in df.columns else None
+        if values is None:
+            continue
+        sub = pd.factorize(pd.Series(values).to_numpy())[0]
+        new = pd.DataFrame({"b": ids[big], "s": sub[big]}).groupby(["b", "s"], sort=False).ngroup().to_numpy()
+        ids[big] = ids.max() + 1 + new
+    return pd.Series(ids, index=df.index)
+
+
+# ==== 3) Candidate pairs from the blocking index ====
+def candidate_pairs(df, passes=BLOCKING_PASSES, max_block=MAX_BLOCK):
+    """
+    All cross-wave row pairs (i from an earlier year than j) that share a block in any pass.
+    `passes` is a bit mask of the passes that produced the pair (bit k = pass k).
+    """
+    pairs = []
+    year = df["year"].to_numpy()
+    for k, keys in enumerate(passes):
+        ids = split_large_blocks(df, block_ids(df, keys), max_block)
+        blk = pd.DataFrame({"block": ids.to_numpy(), "row": np.arange(len(df)), "year": year})
+        blk = blk[blk["block"] >= 0]
+        size = blk.groupby("block")["row"].transform("size")
+        skipped = blk.loc[size > max_block, "block"].nunique()
+        if skipped:
+            print(f"[warning] {skipped} blocks still larger than {max_block} after sub-blocking skipped for keys {keys}")
+        blk = blk[(size > 1) & (size <= max_block)]
+        # self-join inside blocks, keep earlier-wave → later-wave pairs only
+        p = blk.merge(blk, on="block", suffixes=("_a", "_b"))
+        p = p[p["year_a"] < p["year_b"]]
+        pairs.append(p[["row_a", "row_b"]].assign(passes=1 << k))
+    if not pairs:
+        return pd.DataFrame(columns=["row_a", "row_b", "passes"])
+    return (pd.concat(pairs, ignore_index=True)
+              .groupby(["row_a", "row_b"], as_index=False)["passes"].agg(np.bitwise_or.reduce))
+
+
+# ==== 4) Vectorized similarity scoring ====
+def score_pairs(df, pairs, weights=WEIGHTS, passes=BLOCKING_PASSES, discriminating=DISCRIMINATING):
+    """
+    Weighted agreement share over the comparisons that are observed for both rows and were not
+    blocking keys of the pair; 0 unless a discriminating fact agrees and none disagrees.
+    """
+    a, b = pairs["row_a"].to_numpy(), pairs["row_b"].to_numpy()
+    mask = pairs["passes"].to_numpy() if "passes" in pairs else np.zeros(len(pairs), int)
+    num = np.zeros(len(pairs))
+    den = np.zeros(len(pairs))
+    evidence = np.zeros(len(pairs), bool)
+    conflict = np.zeros(len(pairs), bool)
+
+    def add(name, agree, observed):
+        for k, keys in enumerate(passes):
+            if name in keys:
+                observed = observed & ((mask >> k) & 1 == 0)
+        w = weights.get(name, 0)
+        num[:] += w * (agree & observed)
+        den[:] += w * observed
+        if name in discriminating:
+            evidence[:] |= agree & observed
+            conflict[:] |= ~agree & observed
+
+    def col(c):
+        return pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float) if c in df.columns else None
+
+    gap = col("year")[b] - col("year")[a]
+    v = birth_month(df).to_numpy(dtype=float)
+    add("birth_month", v[a] == v[b], ~np.isnan(v[a]) & ~np.isnan(v[b]))
+    if (v := col("marriage_year")) is not None:
+        add("marriage_year", v[a] == v[b], (v[a] > 0) & (v[b] > 0))
+    if (v := col("migration_year")) is not None:
+        add("migration_year", v[a] == v[b], (v[a] > 0) & (v[b] > 0))
+    if (v := col("rural")) is not None:
+        add("rural", v[a] == v[b], ~np.isnan(v[a]) & ~np.isnan(v[b]))
+    edu = education_level(df).to_numpy(dtype=float)
+    add("education", edu[b] >= edu[a], ~np.isnan(edu[a]) & ~np.isnan(edu[b]))
+    if (v := col("marriage")) is not None:
+        add("marriage", v[b] >= v[a], ~np.isnan(v[a]) & ~np.isnan(v[b]))
+    if (v := col("kids_number")) is not None:
+        d = v[b] - v[a]
+        add("kids_number", (d >= 0) & (d <= np.maximum(gap, 1)) & (d <= 3), ~np.isnan(d))
+    for name in ["city_clean", "employment_group"]:
+        if name in df.columns:
+            s = df[name].astype(str).str.strip().to_numpy()
+            observed = df[name].notna().to_numpy()
+            add(name, s[a] == s[b], observed[a] & observed[b])
+    if (v := col("income_total_m")) is not None:
+        obs = (v[a] > 0) & (v[b] > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            add("income", np.abs(np.log(v[b] / v[a])) < 0.5, obs)
+
+    with np.errstate(invalid="ignore"):
+        score = np.where(den > 0, num / den, 0.0)
+    return np.where(evidence & ~conflict, score, 0.0)
+
+
+# ==== 5) Clusters ====
+def link(df, threshold=THRESHOLD, passes=BLOCKING_PASSES, max_block=MAX_BLOCK):
+    """
+    Returns (cluster id per row, accepted links). Each row links to at most one row per later
+    wave (its best-scoring candidate), so one generic profile cannot chain many people together.
+    """
+    df = df.reset_index(drop=True)
+    pairs = candidate_pairs(df, passes, max_block)
+    if pairs.empty:
+        # e.g. a single-wave file: nothing to link, every row is its own respondent
+        return np.arange(len(df), dtype=np.int64), pd.DataFrame(columns=["row_a", "row_b", "score"])
+    pairs["score"] = score_pairs(df, pairs)
+    links = pairs[pairs["score"] >= threshold].copy()
+    links["year_b"] = df["year"].to_numpy()[links["row_b"].to_numpy()]
+    links = (links.sort_values("score", ascending=False)
+                  .drop_duplicates(["row_a", "year_b"])   # best match in each later wave
+                  .drop_duplicates(["row_b"]))            # each later row claimed once
+    n = len(df)
+    graph = coo_matrix((np.ones(len(links)), (links["row_a"], links["row_b"])), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    return labels.astype(np.int64), links.drop(columns=["year_b", "passes"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Link repeat respondents across survey waves")
+    parser.add_argument("panel", help="stacked panel CSV, e.g. panel_data/after_merge_1021.csv")
+    parser.add_argument("-o", "--output", default="panel_linked.csv")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--max-block", type=int, default=MAX_BLOCK)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.panel, low_memory=False)
+    df["respondent_cluster"], links = link(df, threshold=args.threshold, max_block=args.max_block)
+    df.to_csv(args.output, index=False, encoding="utf-8-sig")
+    repeated = df["respondent_cluster"].duplicated(keep=False).sum()
+    print(f"✔ {len(links)} links, {repeated} rows in multi-wave clusters, "
+          f"{df['respondent_cluster'].nunique()} distinct respondents; saved to: {args.output}")
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.inspection import permutation_importance
+from threadpoolctl import threadpool_limits
+
+MISSING_BIN = 254  # bins 0..253 hold values, 254 marks missing (fits in uint8 and in max_bins=255)
+
+
+class HistBinner:
+    """
+    Bin every feature once into uint8 codes: numeric columns by quantile edges,
+    categorical (object / category) columns by their most frequent levels – no get_dummies.
+    """
+
+    def __init__(self, max_bins=MISSING_BIN, max_categories=MISSING_BIN):
+        self.max_bins = max_bins
+        self.max_categories = max_categories
+
+    def fit(self, X):
+        self.columns_ = list(X.columns)
+        self.edges_, self.levels_ = {}, {}
+        for c in self.columns_:
+            s = X[c]
+            if s.dtype == object or isinstance(s.dtype, pd.CategoricalDtype) or s.dtype == bool:
+                top = s.astype(str).where(s.notna()).value_counts().index[: self.max_categories - 1]
+                self.levels_[c] = pd.Index(top)  # remaining levels share the last code
+            else:
+                v = pd.to_numeric(s, errors="coerce").to_numpy(dtype=float)
+                v = v[~np.isnan(v)]
+                q = np.quantile(v, np.linspace(0, 1, self.max_bins + 1)[1:-1]) if len(v) else np.array([])
+                self.edges_[c] = np.unique(q)
+        return self
+
+    def transform(self, X):
+        X = X.reindex(columns=self.columns_)
+        out = np.empty((len(X), len(self.columns_)), dtype=np.uint8)
+        for j, c in enumerate(self.columns_):
+            s = X[c]
+            if c in self.levels_:
+                levels = self.levels_[c]
+                codes = levels.get_indexer(s.astype(str))
+                codes = np.where(codes < 0, len(levels), codes)  # unseen / rare levels
+                out[:, j] = np.where(s.isna(), MISSING_BIN, codes)
+            else:
+                v = pd.to_numeric(s, errors="coerce").to_numpy(dtype=float)
+                codes = np.searchsorted(self.edges_[c], v, side="right")
+                out[:, j] = np.where(np.isnan(v), MISSING_BIN, codes)
+        return out
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+    @property
+    def categorical_mask(self):
+        return np.array([c in self.levels_ for c in self.columns_])
+
+
+class HistBoostingClassifier(BaseEstimator, ClassifierMixin):
+    """Multiclass histogram gradient boosting on pre-binned uint8 features, with early stopping"""
+
+    def __init__(self, learning_rate=0.1, max_iter=500, max_leaf_nodes=63, min_samples_leaf=40,
+                 l2_regularization=1.0, class_weight="balanced", validation_fraction=0.1,
+                 n_iter_no_change=15, random_state=42, n_jobs=None):
+        self.learning_rate = learning_rate
+        self.max_iter = max_iter
+        self.max_leaf_nodes = max_leaf_nodes
+        self.min_samples_leaf = min_samples_leaf
+        self.l2_regularization = l2_regularization
+        self.class_weight = class_weight
+        self.validation_fraction = validation_fraction
+        self.n_iter_no_change = n_iter_no_change
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+
+    def _threads(self):
+        """Cap the OpenMP threads of the sklearn booster at n_jobs (None / -1: all cores), like n_jobs on the forest"""
+        n_jobs = getattr(self, "n_jobs", None)  # models pickled before n_jobs existed
+        return threadpool_limits(limits=None if n_jobs in (None, -1) else max(1, n_jobs), user_api="openmp")
+
+    def fit(self, X, y, sample_weight=None):
+        self.binner_ = HistBinner()
+        codes = self.binner_.fit_transform(X)
+        self.model_ = HistGradientBoostingClassifier(
+            learning_rate=self.learning_rate,
+            max_iter=self.max_iter,
+            max_leaf_nodes=self.max_leaf_nodes,
+            min_samples_leaf=self.min_samples_leaf,
+            l2_regularization=self.l2_regularization,
+            class_weight=self.class_weight,
+            categorical_features=self.binner_.categorical_mask,
+            early_stopping=True,
+            validation_fraction=self.validation_fraction,
+            n_iter_no_change=self.n_iter_no_change,
+            random_state=self.random_state,
+        )
+        with self._threads():
+            self.model_.fit(codes, np.asarray(y), sample_weight=sample_weight)
+        self.classes_ = self.model_.classes_
+        self.feature_names_in_ = np.array(self.binner_.columns_, dtype=object)
+        return self
+
+    def predict(self, X):
+        with self._threads():
+            return self.model_.predict(self.binner_.transform(X))
+
+    def predict_proba(self, X):
+        with self._threads():
+            return self.model_.predict_proba(self.binner_.transform(X))
+
+    @property
+    def n_iter_(self):
+        return self.model_.n_iter_
+
+    def importances(self, X, y, n_rows=20_000, n_repeats=3, sample_weight=None):
+        """Permutation importance on (a sample of) held-out rows, computed on the binned matrix"""
+        codes = self.binner_.transform(X)
+        y = np.asarray(y)
+        if len(codes) > n_rows:
+            idx = np.random.default_rng(self.random_state).choice(len(codes), n_rows, replace=False)
+            codes, y = codes[idx], y[idx]
+            sample_weight = None if sample_weight is None else np.asarray(sample_weight)[idx]
+        with self._threads():
+            result = permutation_importance(self.model_, codes, y, n_repeats=n_repeats,
+                                            random_state=self.random_state, sample_weight=sample_weight)
+        return result.importances_mean
@@ -0,0 +1,180 @@
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+import joblib
+from joblib import Parallel, delayed
+from sklearn.neighbors import KDTree
+
+# Columns to impute. For zero-filled columns the raw column tells whether the value was really missing:
+# {column: raw column whose NaN marks the row as missing (None = the column itself)
+#          or (raw column, (condition column, value)): missing only on rows where the condition holds}
+# Not imputed: rent_m / rent_m_win. Rent is never reported as 0 (minimum 60), so no rent means
+# paying none (own home, dormitory); the cleaning scripts' 0 is a real value.
+IMPUTE_COLUMNS = {
+    "income_total_m": None, "exp_total_m": None, "food_exp_m": None, "income_to_home": None,
+    "income_total_m_win": "income_total_m", "exp_total_m_win": "exp_total_m", "food_exp_m_win": "food_exp_m",
+    "income_to_home_win": "income_to_home",
+    "workdays_w": None, "workhours_d": None, "hours_per_week": None,
+    "hours_per_week_filled": "hours_per_week",
+    # the never married have no marriage year and a true marriage length of 0
+    "length_marriage": ("marriage_year", ("marriage", 1)),
+}
+
+# Compact, always-present features used to find neighbours (never the destination pro_code)
+NN_FEATURES = ["age", "male", "rural", "is_han", "high_school", "junior_college", "bachelor", "graduate",
+               "marriage", "employed", "kids_number", "migration_interval", "year"]
+
+# Group keys for the group-median fallback, from finest to coarsest
+GROUP_LEVELS = [["year", "rural", "employment_group"], ["year", "rural"], ["year"]]
+
+
+def to_float(frame):
+    """Float array of a frame; only text columns go through pd.to_numeric (unparseable → NaN)"""
+    text = frame.columns[frame.dtypes == object]
+    if len(text):
+        frame = frame.assign(**{c: pd.to_numeric(frame[c], errors="coerce") for c in text})
+    return frame.to_numpy(dtype=float)
+
+
+def _impute_chunk(X_chunk, tree, donor_values, k):
+    """Mean of the k nearest donors, per target column, ignoring donors that are missing there too"""
+    _, idx = tree.query(X_chunk, k=k)
+    vals = donor_values[idx]  # rows × k × targets
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all k donors missing → NaN, filled by group medians
+        return np.nanmean(vals, axis=1)
+
+
+class PanelImputer:
+    """
+    Missingness indicators + imputation of numeric columns.
+    method="group": median within the finest GROUP_LEVELS group that has data.
+    method="knn": mean of the k nearest neighbours among a bounded donor sample,
+                  searched in a KD-tree on a standardized compact feature subset;
+                  anything still missing falls back to the group medians.
+    """
+
+    def __init__(self, columns=IMPUTE_COLUMNS, method="knn", k=10, max_donors=200_000,
+                 nn_features=NN_FEATURES, group_levels=GROUP_LEVELS, seed=42):
+        self.columns = dict(columns)
+        self.method = method
+        self.k = k
+        self.max_donors = max_donors
+        self.nn_features = list(nn_features)
+        self.group_levels = [list(g) for g in group_levels]
+        self.seed = seed
+
+    def missing_mask(self, df):
+        masks = {}
+        for col, source in self.columns.items():
+            if col not in df.columns:
+                continue
+            source, condition = source if isinstance(source, tuple) else (source, None)
+            src = source if source in df.columns else col
+            masks[col] = df[src].isna().to_numpy() | df[col].isna().to_numpy()
+            if condition is not None and condition[0] in df.columns:
+                masks[col] &= (df[condition[0]] == condition[1]).to_numpy()
+        return pd.DataFrame(masks, index=df.index)
+
+    def fit(self, df):
+        mask = self.missing_mask(df)
+        self.targets_ = list(mask.columns)
+        values = df[self.targets_].apply(pd.to_numeric, errors="coerce").mask(mask.to_numpy())
+
+        # group medians, finest level first
+        self.group_medians_ = []
+        for keys in self.group_levels:
+            keys = [k for k in keys if k in df.columns]
+            if keys:
+                self.group_medians_.append((keys, values.groupby([df[k] for k in keys]).median()))
+        self.global_median_ = values.median()
+
+        if self.method == "knn":
+            self.features_ = [c for c in self.nn_features if c in df.columns]
+            feats = df[self.features_].apply(pd.to_numeric, errors="coerce")
+            self.center_ = feats.mean()
+            self.scale_ = feats.std().replace(0, 1).fillna(1)
+            # donors: rows with at least one observed target, capped to keep the index small
+            donors = np.flatnonzero(~mask.to_numpy().all(axis=1))
+            if len(donors) > self.max_donors:
+                donors = np.sort(np.random.default_rng(self.seed).choice(donors, self.max_donors, replace=False))
+            Z = ((feats.iloc[donors] - self.center_) / self.scale_).fillna(0).to_numpy(dtype=np.float32)
+            self.tree_ = KDTree(Z, leaf_size=40)
+            self.donor_values_ = values.iloc[donors].to_numpy(dtype=np.float32)
+        return self
+
+    def _group_fill(self, df, values):
+        for keys, med in self.group_medians_:
+            if not values.isna().any().any():
+                break
+            lookup = pd.MultiIndex.from_frame(df[keys]) if len(keys) > 1 else pd.Index(df[keys[0]])
+            fill = med.reindex(lookup)
+            fill.index = values.index
+            values = values.fillna(fill)
+        return values.fillna(self.global_median_)
+
+    def transform(self, df, n_jobs=-1, chunksize=100_000, indicators=True):
+        mask = self.missing_mask(df)[self.targets_]
+        missing = mask.to_numpy()
+        # plain arrays from here on: per-column pandas overhead dominates on small scoring batches
+        values = to_float(df[self.targets_])
+        values[missing] = np.nan
+
+        rows = np.flatnonzero(missing.any(axis=1))
+        if self.method == "knn" and len(rows):
+            feats = to_float(df[self.features_].iloc[rows])
+            Z = ((feats - self.center_.to_numpy()) / self.scale_.to_numpy()).astype(np.float32)
+            Z[np.isnan(Z)] = 0
+            k = min(self.k, len(self.donor_values_))
+            chunks = [Z[i:i + chunksize] for i in range(0, len(Z), chunksize)]
+            if n_jobs == 1 or len(chunks) == 1:
+                # a single chunk (e.g. a scoring batch): starting a worker pool costs more than the query
+                parts = [_impute_chunk(c, self.tree_, self.donor_values_, k) for c in chunks]
+            else:
+                parts = Parallel(n_jobs=n_jobs)(
+                    delayed(_impute_chunk)(c, self.tree_, self.donor_values_, k) for c in chunks
+                )
+            sub = values[rows]  # rows without a missing target are untouched
+            values[rows] = np.where(np.isnan(sub), np.vstack(parts), sub)
+
+        values = pd.DataFrame(values, index=df.index, columns=self.targets_)
+        if values.isna().to_numpy().any():
+            values = self._group_fill(df, values)
+        columns = list(df.columns)
+        parts = [df.drop(columns=self.targets_), values]
+        if indicators:
+            # one concat instead of a column insert per target and indicator (cheaper on small scoring batches too)
+            flags = mask.astype("int8").add_suffix("_missing")
+            columns = [c for c in columns if c not in flags.columns] + list(flags.columns)
+            parts = [parts[0].drop(columns=flags.columns, errors="ignore"), values, flags]
+        return pd.concat(parts, axis=1)[columns]
+
+    def save(self, path):
+        joblib.dump(self, path, compress=3)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Impute missing numeric panel columns")
+    parser.add_argument("panel", help="panel CSV")
+    parser.add_argument("-o", "--output", default="panel_imputed.csv")
+    parser.add_argument("--imputer", default="panel_imputer.joblib", help="fitted imputer (reused if it exists)")
+    parser.add_argument("--method", choices=["knn", "group"], default="knn")
+    parser.add_argument("--jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.panel, low_memory=False)
+    try:
+        imputer = PanelImputer.load(args.imputer)
+        print(f"✔ Loaded imputer {args.imputer}")
+    except FileNotFoundError:
+        imputer = PanelImputer(method=args.method).fit(df)
+        imputer.save(args.imputer)
+        print(f"✔ Imputer saved to: {args.imputer}")
+    out = imputer.transform(df, n_jobs=args.jobs)
+    out.to_csv(args.output, index=False, encoding="utf-8-sig")
+    print(f"✔ Imputed {len(imputer.targets_)} columns, saved to: {args.output}")
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.base import clone
+from stratified_sampling import reservoir_merge
+
+
+def _tree_proba(tree, X):
+    """DecisionTreeClassifier.predict_proba without the per-call checks (X: aligned float32 array)"""
+    proba = tree.tree_.predict(X)[:, :tree.n_classes_]
+    normalizer = proba.sum(axis=1, keepdims=True)
+    normalizer[normalizer == 0] = 1
+    return proba / normalizer
+
+
+class IncrementalForest:
+    """
+    A forest grown wave by wave. Each wave adds a sub-forest ("cohort") fitted only on the
+    new wave (or new wave + reservoir sample of old rows); the oldest trees are retired once
+    the forest exceeds `max_trees`. Prediction and feature importances are tree-weighted
+    averages over cohorts, so nothing old is refitted.
+    """
+
+    def __init__(self, base_forest, feature_names, max_trees=300, reservoir_size=50_000, seed=42):
+        self.base_forest = clone(base_forest)
+        self.feature_names = list(feature_names)
+        self.max_trees = max_trees
+        self.reservoir_size = reservoir_size
+        self.seed = seed
+        self.cohorts = []  # [{"wave": label, "forest": fitted RandomForestClassifier}], oldest first
+        self.reservoir = None  # aligned feature rows + "_y" + "_key"
+        self.imputer_path = None  # PanelImputer the training rows went through (None = plain 0 fills)
+        self.input_columns = None  # raw column → "numeric" / "category" before one-hot (used for scoring)
+
+    # ---------- data alignment ----------
+    def align(self, X):
+        """Same dummy columns as the first fit: unseen columns are dropped, missing ones are 0"""
+        return X.reindex(columns=self.feature_names, fill_value=0)
+
+    # ---------- training ----------
+    @classmethod
+    def from_forest(cls, forest, X, y, wave, **kwargs):
+        """Wrap an already fitted forest (e.g. the 300-tree model of random_forest.py)"""
+        model = cls(forest, X.columns, **kwargs)
+        model.cohorts.append({"wave": str(wave), "forest": forest})
+        model._remember(X, y)
+        return model
+
+    def update(self, X_new, y_new, wave, n_trees=100, mix="reservoir", max_trees=None):
+        """
+        Add `n_trees` fitted on the new wave only (mix="new") or on the new wave plus the
+        reservoir sample of earlier rows (mix="reservoir"), then retire the oldest trees.
+        max_trees: new size limit (kept for later updates); None keeps the saved one.
+        """
+        if max_trees is not None:
+            self.max_trees = max_trees
+        X_new = self.align(X_new)
+        y_new = pd.Series(y_new).astype(str).reset_index(drop=True)
+        X_fit, y_fit = X_new.reset_index(drop=True), y_new
+        if mix == "reservoir" and self.reservoir is not None and len(self.reservoir):
+            X_fit = pd.concat([X_fit, self.reservoir[self.feature_names]], ignore_index=True)
+            y_fit = pd.concat([y_fit, self.reservoir["_y"]], ignore_index=True)
+        elif mix not in ("new", "reservoir"):
+            raise ValueError(f"Unknown mix: {mix}")
+
+        forest = clone(self.base_forest).set_params(
+            n_estimators=n_trees, random_state=self.seed + len(self.cohorts), warm_start=False)
+        forest.fit(X_fit, y_fit)
+        self.cohorts.append({"wave": str(wave), "forest": forest})
+        self._remember(X_new, y_new)
+        self.retire()
+        return self
+
+    def _remember(self, X, y):
+        rows = self.align(X).reset_index(drop=True)
+        rows["_y"] = pd.Series(y).astype(str).to_numpy()
+        self.reservoir = reservoir_merge(self.reservoir, rows, self.reservoir_size,
+                                         seed=self.seed + len(self.cohorts))
+
+    def retire(self, max_trees=None, keep_waves=None):
+        """Drop the oldest trees beyond `max_trees`, and/or whole cohorts older than the last `keep_waves` waves"""
+        max_trees = self.max_trees if max_trees is None else max_trees
+        if keep_waves is not None:
+            self.cohorts = self.cohorts[-keep_waves:]
+        excess = self.n_trees - max_trees if max_trees else 0
+        while excess > 0 and len(self.cohorts) > 1:
+            forest = self.cohorts[0]["forest"]
+            n = len(forest.estimators_)
+            if n <= excess:
+                self.cohorts.pop(0)
+                excess -= n
+            else:
+                forest.estimators_ = forest.estimators_[excess:]
+                forest.n_estimators = len(forest.estimators_)
+                excess = 0
+        return self
+
+    # ---------- prediction ----------
+    @property
+    def n_trees(self):
+        return sum(len(c["forest"].estimators_) for c in self.cohorts)
+
+    @property
+    def classes_(self):
+        return np.unique(np.concatenate([c["forest"].classes_.astype(str) for c in self.cohorts]))
+
+    def predict_proba(self, X):
+        # trees are queried directly: forest.predict_proba re-validates the input and dispatches through
+        # joblib for every call, which costs far more than the trees themselves on small scoring batches
+        X = np.ascontiguousarray(self.align(X).to_numpy(dtype=np.float32))
+        classes = self.classes_
+        proba = np.zeros((len(X), len(classes)))
+        for c in self.cohorts:
+            forest = c["forest"]
+            cols = np.searchsorted(classes, forest.classes_.astype(str))
+            proba[:, cols] += sum(_tree_proba(tree, X) for tree in forest.estimators_)
+        return proba / self.n_trees
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    @property
+    def feature_importances_(self):
+        """Tree-weighted average of the cohorts' importances (no refit needed)"""
+        weights = np.array([len(c["forest"].estimators_) for c in self.cohorts], dtype=float)
+        stacked = np.vstack([c["forest"].feature_importances_ for c in self.cohorts])
+        return weights @ stacked / weights.sum()
+
+    def summary(self):
+        return pd.DataFrame([{"wave": c["wave"], "trees": len(c["forest"].estimators_)} for c in self.cohorts])
+
+    # ---------- storage ----------
+    def save(self, path):
+        joblib.dump(self, path, compress=3)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
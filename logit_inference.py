@@ -0,0 +1,154 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from scipy.stats import norm
+
+# Ratio determinants, same definitions as logistic_regression.sas (after migration / before migration)
+RATIOS = {
+    "gdp_move_std": ("gdp_after_move", "gdp_before_move"),
+    "average_temp_std": ("average_temp_a", "average_temp_b"),
+    "lowest_temp_std": ("lowest_temp(Jan)_a", "lowest_temp(Jan)_b"),
+    "manageable_income_std": ("manageable_income_per_capita_a", "manageable_income_per_capita_b"),
+    "population_std": ("population(10k)_a", "population(10k)_b"),
+    "precipitation_std": ("precipitation(mm)_a", "precipitation(mm)_b"),
+    "highest_temp_std": ("highest_temp(July)_a", "highest_temp(July)_b"),
+    "road_length_std": ("road_length_per_10K (km)_a", "road_length_per_10K (km)_b"),
+    "gdp_per_capita_std": ("gdp per capita(k)_a", "gdp per capita(k)_b"),
+}
+OUTCOMES = ["Migrate_1", "Migrate_2", "Migrate_3"]
+
+
+def ratio_features(df):
+    """The nine *_std ratios of logistic_regression.sas"""
+    out = pd.DataFrame(index=df.index)
+    for name, (after, before) in RATIOS.items():
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[name] = pd.to_numeric(df[after], errors="coerce") / pd.to_numeric(df[before], errors="coerce")
+    return out
+
+
+def design_matrix(df, clusters="pro_code"):
+    """One design matrix (intercept + ratios) shared by all outcomes; rows with missing values are dropped like PROC LOGISTIC"""
+    feats = ratio_features(df)
+    keep = np.isfinite(feats.to_numpy()).all(axis=1) & df[clusters].notna().to_numpy()
+    for y in OUTCOMES:
+        keep &= df[y].notna().to_numpy()
+    X = np.column_stack([np.ones(keep.sum()), feats.to_numpy()[keep]])
+    codes, levels = pd.factorize(df.loc[keep, clusters])
+    Y = df.loc[keep, OUTCOMES].to_numpy(dtype=float)
+    return X, Y, codes, levels, ["Intercept"] + list(RATIOS)
+
+
+# ==== 1) Logit by Newton–Raphson (weighted, warm-startable) ====
+def fit_logit(X, y, w=None, beta0=None, tol=1e-8, max_iter=50):
+    w = np.ones(len(y)) if w is None else w
+    beta = np.zeros(X.shape[1]) if beta0 is None else beta0.copy()
+    for _ in range(max_iter):
+        p = 1 / (1 + np.exp(-np.clip(X @ beta, -30, 30)))
+        grad = X.T @ (w * (y - p))
+        hess = (X * (w * p * (1 - p))[:, None]).T @ X
+        try:
+            step = np.linalg.solve(hess, grad)
+        except np.linalg.LinAlgError:
+            step = np.linalg.lstsq(hess, grad, rcond=None)[0]
+        beta += step
+        if np.max(np.abs(step)) < tol:
+            break
+    return beta
+
+
+# ==== 2) Sandwich covariance, vectorized over clusters ====
+def cluster_covariance(X, y, beta, codes):
+    """CR1 cluster-robust covariance: bread · (Σ_g s_g s_gᵀ) · bread with the usual small-sample factor"""
+    n, k = X.shape
+    p = 1 / (1 + np.exp(-np.clip(X @ beta, -30, 30)))
+    bread = np.linalg.pinv((X * (p * (1 - p))[:, None]).T @ X)
+    n_clusters = codes.max() + 1
+    scores = np.zeros((n_clusters, k))
+    np.add.at(scores, codes, X * (y - p)[:, None])  # per-cluster score sums in one pass
+    meat = scores.T @ scores
+    c = n_clusters / (n_clusters - 1) * (n - 1) / (n - k) if n_clusters > 1 else 1.0
+    return c * bread @ meat @ bread, bread
+
+
+# ==== 3) Cluster bootstrap across a process pool ====
+_X = _Y = _CODES = _BETA0 = None
+
+
+def _init_worker(X, Y, codes, beta0):
+    global _X, _Y, _CODES, _BETA0
+    _X, _Y, _CODES, _BETA0 = X, Y, codes, beta0
+
+
+def _bootstrap_batch(seeds):
+    """Resample clusters as row weights (no data copies), warm-start each fit from the full-sample estimate"""
+    n_clusters = _CODES.max() + 1
+    out = np.empty((len(seeds), _Y.shape[1], _X.shape[1]))
+    for r, seed in enumerate(seeds):
+        draw = np.random.default_rng(seed).integers(0, n_clusters, n_clusters)
+        w = np.bincount(draw, minlength=n_clusters)[_CODES].astype(float)
+        for j in range(_Y.shape[1]):
+            out[r, j] = fit_logit(_X, _Y[:, j], w=w, beta0=_BETA0[j], max_iter=25)
+    return out
+
+
+def cluster_bootstrap(X, Y, codes, betas, reps=1000, workers=None, seed=42, batch=25):
+    seeds = np.random.SeedSequence(seed).generate_state(reps)
+    batches = [seeds[i:i + batch] for i in range(0, reps, batch)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                             initargs=(X, Y, codes, betas)) as pool:
+        return np.concatenate(list(pool.map(_bootstrap_batch, batches)))
+
+
+# ==== 4) Report ====
+def infer(df, clusters="pro_code", reps=1000, workers=None, seed=42):
+    X, Y, codes, levels, names = design_matrix(df, clusters)
+    betas = np.array([fit_logit(X, Y[:, j]) for j in range(Y.shape[1])])
+    boot = cluster_bootstrap(X, Y, codes, betas, reps=reps, workers=workers, seed=seed) if reps else None
+    tables = {}
+    for j, outcome in enumerate(OUTCOMES):
+        V, bread = cluster_covariance(X, Y[:, j], betas[j], codes)
+        se = np.sqrt(np.diag(V))
+        t = pd.DataFrame({
+            "coef": betas[j],
+            "se_model": np.sqrt(np.diag(bread)),
+            "se_cluster": se,
+            "z_cluster": betas[j] / se,
+            "p_cluster": 2 * norm.sf(np.abs(betas[j] / se)),
+        }, index=names)
+        if boot is not None:
+            t["se_boot"] = boot[:, j].std(axis=0, ddof=1)
+            t["ci_boot_low"], t["ci_boot_high"] = np.percentile(boot[:, j], [2.5, 97.5], axis=0)
+        tables[outcome] = t
+    print(f"{len(X)} rows, {len(levels)} clusters ({clusters}), {reps} bootstrap replicates")
+    return tables
+
+
+def save_models(tables, path="logit_models.json"):
+    """Coefficients per outcome, in the format the scoring service loads"""
+    models = {y: {"features": list(t.index[1:]), "intercept": float(t.loc["Intercept", "coef"]),
+                  "coef": [float(v) for v in t["coef"].iloc[1:]]} for y, t in tables.items()}
+    with open(path, "w") as f:
+        json.dump({"ratios": RATIOS, "models": models}, f, indent=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clustered and bootstrap inference for the Migrate_1/2/3 logits")
+    parser.add_argument("panel", help="panel CSV, e.g. 2008Before_1021.csv")
+    parser.add_argument("--clusters", default="pro_code", help="cluster column (pro_code, hs_residence, respondent_cluster)")
+    parser.add_argument("--reps", type=int, default=1000, help="cluster bootstrap replicates (0 = none)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--prefix", default="logit")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.panel, low_memory=False)
+    tables = infer(df, clusters=args.clusters, reps=args.reps, workers=args.workers)
+    for outcome, t in tables.items():
+        print(f"\n{outcome}")
+        print(t.round(4))
+        t.to_csv(f"{args.prefix}_{outcome}_inference.csv")
+    save_models(tables, f"{args.prefix}_models.json")
+    print(f"✔ Saved {args.prefix}_<outcome>_inference.csv and {args.prefix}_models.json")
@@ -5,72 +5,250 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
 import matplotlib.pyplot as plt
 import seaborn as sns
+import argparse
+import io
+import os
+import time
+import joblib
+from cross_validation import make_folds, cross_validate, write_report
+from incremental_forest import IncrementalForest
+from hist_boosting import HistBoostingClassifier
+from stratified_sampling import stratified_sample, balanced_weights
+from imputation import PanelImputer
 
-# read data
-df = pd.read_csv("panel_data/2008before.csv")
+parser = argparse.ArgumentParser(description="Random forest for migration destination (pro_code)")
+parser.add_argument("--cv", choices=["year", "cohort", "province", "respondent", "random"], default=None,
+                    help="also run cross-validation: by survey year, migration_year cohort, origin province, "
+                         "linked respondent (respondent_cluster), or random")
+parser.add_argument("--cores", type=int, default=-1, help="total core budget for model fitting")
+parser.add_argument("--backend", choices=["rf", "hgb"], default="rf",
+                    help="rf: random forest on one-hot features; hgb: histogram gradient boosting on binned codes")
+parser.add_argument("--sample-cap", type=int, default=None,
+                    help="train on at most this many rows per pro_code x year stratum, weighted back to the full panel")
+parser.add_argument("--impute", choices=["knn", "group"], default=None,
+                    help="impute missing income/hours/marriage columns (with missingness indicators) instead of filling 0")
+parser.add_argument("--imputer", default="2008before_imputer.joblib", help="where the fitted imputer is saved / loaded")
+parser.add_argument("--model", default=None, help="where the fitted model is saved / loaded")
+parser.add_argument("--update", metavar="NEW_WAVE_CSV", default=None,
+                    help="add trees for a newly cleaned wave to the saved forest instead of retraining")
+parser.add_argument("--new-trees", type=int, default=100, help="trees fitted for the new wave")
+parser.add_argument("--max-trees", type=int, default=None,
+                    help="oldest trees are retired beyond this size (new forest: 300; --update: keeps the saved limit)")
+parser.add_argument("--mix", choices=["reservoir", "new"], default="reservoir",
+                    help="fit new trees on the new wave plus a reservoir sample of old rows, or on the new wave only")
+args = parser.parse_args()
+if args.update and args.backend != "rf":
+    parser.error("--update is only available for the random forest backend")
+prefix = "2008before" if args.backend == "rf" else f"2008before_{args.backend}"
+args.model = args.model or f"2008before_{args.backend}_model.joblib"
 
 # Delete variables that may reveal migration destinations
 drop_cols = [
-    'pro_name', 'city_clean', 'is_beijing', 'is_shanghai',
+    'pro_name', 'city_clean', 'city_code', 'city_level', 'is_beijing', 'is_shanghai',
     'pro_name_true', 'English_name', 'hs_residence',
     # after_migration(_a)
     'lowest_temp(Jan)_a', 'average_temp_a', 'highest_temp(July)_a', 'precipitation(mm)_a',
     'gdp per capita(k)_a', 'unemployment(%)_a', 'education_budget(10k)_a',
     'marriage(10k)_a', 'population(10k)_a', 'Medical technicians per 10k_a',
     'road_length_per_10K (km)_a', 'manageable_income_per_capita_a',
-    'Migrate', 'Migrate_1', 'Migrate_2'
+    'Migrate', 'Migrate_1', 'Migrate_2',
+    # identifiers, not features
+    'respondent_cluster',
     #'GDP_after_move', 'migration_year', 'migration_interval', 'migration_distance_km',
 ]
-df = df.drop(columns=drop_cols, errors='ignore')
 
-# aim variable
-y = df['pro_code'].astype(str)
-X = df.drop(columns=['pro_code'], errors='ignore')
-X = X.fillna(0)
-X = pd.get_dummies(X, drop_first=True)
 
-# split dataset
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
+def prepare(df, one_hot=True, drop_first=True):
+    """
+    Drop leaking columns, split off the target and one-hot encode the features.
+    drop_first=False for data encoded on its own against a saved forest (--update): the level dropped
+    there may differ from the training baseline, so every level is kept and align() drops the baseline.
+    """
+    df = df.drop(columns=drop_cols, errors='ignore')
+    # aim variable
+    y = df['pro_code'].astype(str)
+    X = df.drop(columns=['pro_code'], errors='ignore')
+    if not one_hot:
+        # the boosting backend bins raw values itself: missing stays missing, categories stay codes
+        return X, y
+    X = X.fillna(0)
+    X = pd.get_dummies(X, drop_first=drop_first)
+    return X, y
+
+
+def input_schema(df):
+    """Raw feature columns as prepare() sees them: "numeric", or "category" for the ones get_dummies expands"""
+    X = df.drop(columns=drop_cols + ['pro_code'], errors='ignore')
+    return {c: "numeric" if pd.api.types.is_numeric_dtype(t) else "category" for c, t in X.dtypes.items()}
+
+
+def save_artifacts(y_test, y_pred, features, importances, prefix="2008before", sample_weight=None):
+    """Classification report, top-10 importance table and bar chart"""
+    report = classification_report(y_test, y_pred, sample_weight=sample_weight)
+    print("Classification Report:")
+    print(report)
+    with open(f'{prefix}_classification_report.txt', 'w') as f:
+        f.write("Classification Report:\n")
+        f.write(report)
 
-# random forest model
-rf = RandomForestClassifier(
-    n_estimators=300,
-    max_depth=15,
-    random_state=42,
-    class_weight='balanced',
-    n_jobs=-1
+    # feature importance analysis
+    feat_importance = pd.DataFrame({
+        'Feature': features,
+        'Importance': importances
+    }).sort_values(by='Importance', ascending=False)
+
+    # Top 10 indicators
+    top10 = feat_importance.head(10)
+    top10.to_csv(f"{prefix}_top10_migration_factors.csv", index=False)
+    print(f"\ntop 10 most important indicators are saved in: {prefix}_top10_migration_factors.csv")
+
+    # visualization
+    plt.figure(figsize=(8, 6))
+    sns.barplot(data=top10, x='Importance', y='Feature', palette='viridis')
+    plt.title("Top 10 Determinants of Migration Destination", fontsize=13)
+    plt.xlabel("Importance", fontsize=11)
+    plt.ylabel("Feature", fontsize=11)
+    plt.tight_layout()
+    plt.savefig(f"{prefix}_top10_migration_factors.jpg", dpi=300, format='jpg')
+    plt.close()
+    print(f"The image is saved as: {prefix}_top10_migration_factors.jpg")
+
+
+# incremental mode: only the new wave is fitted, cost scales with its size
+if args.update:
+    model = IncrementalForest.load(args.model)
+    new = pd.read_csv(args.update)
+    wave = "/".join(str(v) for v in sorted(new['year'].dropna().unique())) if 'year' in new.columns else args.update
+    imputer_path = getattr(model, "imputer_path", None)
+    if imputer_path:
+        # apply exactly the fills used when the forest was trained (recorded in the model, not guessed from disk)
+        new = PanelImputer.load(imputer_path).transform(new, n_jobs=args.cores)
+    X_new, y_new = prepare(new, drop_first=False)
+    # hold out 20% of the new wave to re-evaluate the updated forest
+    X_new_train, X_hold, y_new_train, y_hold = train_test_split(
+        X_new, y_new, test_size=0.2, random_state=42
+    )
+    model.update(X_new_train, y_new_train, wave=wave, n_trees=args.new_trees, mix=args.mix, max_trees=args.max_trees)
+    print(model.summary())
+    save_artifacts(y_hold, model.predict(X_hold), model.feature_names, model.feature_importances_,
+                   prefix=f"2008before_update_{wave.replace('/', '_')}")
+    model.save(args.model)
+    print(f"✔ Updated forest ({model.n_trees} trees) saved to: {args.model}")
+    raise SystemExit
+
+# read data
+if args.sample_cap:
+    # one streaming pass, per-stratum reservoirs; `_weight` = stratum rows / sampled rows
+    df = stratified_sample("panel_data/2008before.csv", strata=["pro_code", "year"], cap=args.sample_cap)
+    weights = df.pop("_weight").to_numpy()
+    print(f"Sampled {len(df)} rows representing {weights.sum():.0f} panel rows")
+else:
+    df = pd.read_csv("panel_data/2008before.csv")
+    weights = None
+# keys for the CV folds, taken before origin/destination columns are dropped
+cv_keys = df[[c for c in ["year", "migration_year", "hs_residence", "respondent_cluster"] if c in df.columns]]
+# the 80/20 split is fixed on row positions first, so the imputer can be fitted on the training rows only
+train_idx, test_idx = train_test_split(
+    np.arange(len(df)), test_size=0.2, random_state=42, stratify=df['pro_code'].astype(str)
 )
-rf.fit(X_train, y_train)
+
+
+def impute_features(df, train_rows, n_jobs=1):
+    """Imputer fitted on features of the training rows only (never pro_code), applied to every row"""
+    imputer = PanelImputer(method=args.impute).fit(df.iloc[train_rows])
+    return imputer, imputer.transform(df, n_jobs=n_jobs)
+
+
+def fold_features(train_rows):
+    """Per-fold features for --cv: the fold's own imputer, so test-fold values never shape the fills"""
+    return prepare(impute_features(df, train_rows)[1], one_hot=(args.backend == "rf"))[0]
+
+
+X, y = prepare(df, one_hot=(args.backend == "rf"))  # 0 fills; with --impute, replaced after the CV below
+
+if args.backend == "rf":
+    # random forest model
+    rf = RandomForestClassifier(
+        n_estimators=300,
+        max_depth=15,
+        random_state=42,
+        class_weight='balanced',
+        n_jobs=args.cores
+    )
+else:
+    # histogram gradient boosting (features binned once to uint8, early stopping on a validation split)
+    rf = HistBoostingClassifier(n_jobs=args.cores)
+
+# sampled rows: the sampling weights restore the population, then classes are balanced on the weighted
+# counts, so the fit optimizes the same class-balanced objective as class_weight='balanced' on the full panel
+# (sklearn's 'balanced' on the sample would count sampled rows and undo the balancing). Metrics keep `weights`.
+fit_weights = None
+if weights is not None:
+    rf.set_params(class_weight=None)
+    fit_weights = balanced_weights(y, weights)
+
+# cross-validation (folds are cached in cv_folds/ and shared by every model run on the same data)
+if args.cv:
+    folds = make_folds(cv_keys, args.cv, y=y)
+    per_fold, summary = cross_validate(rf, X, y, folds, n_cores=args.cores, sample_weight=weights,
+                                       fit_weight=fit_weights, fold_X=fold_features if args.impute else None)
+    print(f"Cross-validation ({args.cv}):")
+    print(per_fold)
+    print(summary)
+    write_report(per_fold, summary, f"{prefix}_cv_{args.cv}_report.txt", title=f"Cross-validation ({args.cv})")
+
+# split dataset
+if args.impute:
+    # saved, so scoring applies identical fills
+    imputer, df = impute_features(df, train_idx, n_jobs=args.cores)
+    imputer.save(args.imputer)
+    print(f"✔ Imputed {len(imputer.targets_)} columns ({args.impute}, fitted on the training split), "
+          f"imputer saved to: {args.imputer}")
+    X, y = prepare(df, one_hot=(args.backend == "rf"))
+X_train, X_test, y_train, y_test = X.iloc[train_idx], X.iloc[test_idx], y.iloc[train_idx], y.iloc[test_idx]
+w_train = w_test = fw_train = None
+if weights is not None:
+    w_train, w_test, fw_train = weights[train_idx], weights[test_idx], fit_weights[train_idx]
+start = time.perf_counter()
+rf.fit(X_train, y_train, sample_weight=fw_train)
+fit_seconds = time.perf_counter() - start
 
 # model evaluation
 y_pred = rf.predict(X_test)
-print("Classification Report:")
-print(classification_report(y_test, y_pred))
-with open('2008before_classification_report.txt', 'w') as f:
-    f.write("Classification Report:\n")
-    f.write(classification_report(y_test, y_pred))
-
-# feature importance analysis
-importances = rf.feature_importances_
-feat_importance = pd.DataFrame({
-    'Feature': X.columns,
-    'Importance': importances
-}).sort_values(by='Importance', ascending=False)
-
-# Top 10 indicators
-top10 = feat_importance.head(10)
-top10.to_csv("2008before_top10_migration_factors.csv", index=False)
-print("\ntop 10 most important indicators are saved in: top10_migration_factors.csv")
-
-# visualization
-plt.figure(figsize=(8, 6))
-sns.barplot(data=top10, x='Importance', y='Feature', palette='viridis')
-plt.title("Top 10 Determinants of Migration Destination", fontsize=13)
-plt.xlabel("Importance", fontsize=11)
-plt.ylabel("Feature", fontsize=11)
-plt.tight_layout()
-plt.savefig("2008before_top10_migration_factors.jpg", dpi=300, format='jpg')
-plt.close()
-print("The image is saved as: top10_migration_factors.jpg")
+if args.backend == "rf":
+    importances = rf.feature_importances_
+else:
+    importances = rf.importances(X_test, y_test, sample_weight=w_test)
+save_artifacts(y_test, y_pred, X.columns, importances, prefix=prefix, sample_weight=w_test)
+
+# the imputer the features went through travels with the model (None = plain 0 fills)
+imputer_path = os.path.abspath(args.imputer) if args.impute else None
+if args.backend == "rf":
+    # save the forest (plus a reservoir sample of training rows) so new waves can be added with --update
+    wave = "/".join(str(v) for v in sorted(cv_keys['year'].dropna().unique())) if 'year' in cv_keys else "initial"
+    model = IncrementalForest.from_forest(rf, X_train, y_train, wave=wave, max_trees=args.max_trees or 300)
+    model.imputer_path = imputer_path
+    model.input_columns = input_schema(df)  # lets scoring_service.py validate and encode records directly
+    model.save(args.model)
+else:
+    rf.imputer_path = imputer_path
+    rf.input_columns = input_schema(df)
+    joblib.dump(rf, args.model, compress=3)
+print(f"✔ Model saved to: {args.model}")
+
+# training time and model size, to compare backends on the same split
+with open(f"{prefix}_model_stats.txt", "w") as f:
+    f.write(f"backend: {args.backend}\n")
+    f.write(f"training rows: {len(X_train)}, features: {X.shape[1]}\n")
+    if weights is not None:
+        f.write(f"sampled with cap {args.sample_cap} per pro_code x year (weights sum {w_train.sum():.0f})\n")
+    f.write(f"training seconds: {fit_seconds:.1f}\n")
+    # the fitted estimator alone, so rf and hgb compare like for like (the rf file also holds the --update reservoir)
+    buffer = io.BytesIO()
+    joblib.dump(rf, buffer, compress=3)
+    f.write(f"model size (MB, compressed): {buffer.tell() / 1e6:.1f}\n")
+    if args.backend == "rf":
+        f.write(f"saved file incl. reservoir sample (MB): {os.path.getsize(args.model) / 1e6:.1f}\n")
+    if args.backend == "hgb":
+        f.write(f"boosting iterations (early stopping): {rf.n_iter_}\n")
+print(open(f"{prefix}_model_stats.txt").read())
@@ -0,0 +1,356 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+import joblib
+from imputation import PanelImputer, to_float
+from incremental_forest import IncrementalForest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "data cleaning", "name_index"))
+from name_index import PROVINCES  # pro_code → province name in the responses
+
+
+def province_name(code):
+    try:
+        return PROVINCES.get(int(float(code)), (None,))[0]
+    except ValueError:
+        return None
+
+
+# ==== 1) Models, loaded once ====
+class Scorer:
+    """
+    Destination forest (or boosting model), optional imputer and the Migrate_1/2/3 logits,
+    applied to a DataFrame of raw panel-style records with the same encoding as random_forest.py.
+    """
+
+    def __init__(self, model_path, imputer_path=None, logit_path=None):
+        self.model = joblib.load(model_path)
+        # the imputer recorded in the model at training time; an explicit path overrides it
+        self.imputer_path = imputer_path or getattr(self.model, "imputer_path", None)
+        self.imputer = PanelImputer.load(self.imputer_path) if self.imputer_path else None
+        self.logits = None
+        if logit_path and os.path.exists(logit_path):
+            with open(logit_path) as f:
+                self.logits = json.load(f)
+        self.classes = np.asarray(self.model.classes_).astype(str)
+
+        # raw training columns (recorded by random_forest.py; older forests: no checks, plain get_dummies)
+        self.schema = getattr(self.model, "input_columns", None) or {}
+        binner = getattr(self.model, "binner_", None)
+        if not self.schema and binner is not None:
+            self.schema = {c: "category" if c in binner.levels_ else "numeric" for c in binner.columns_}
+        produced = set()  # filled or added by the imputer, so a record may leave them out
+        if self.imputer is not None:
+            produced = set(self.imputer.targets_) | {f"{c}_missing" for c in self.imputer.targets_}
+        self.required = [c for c in self.schema if c not in produced]
+        self.numeric = [c for c, kind in self.schema.items() if kind == "numeric"]
+        if isinstance(self.model, IncrementalForest) and self.schema:
+            self._plan_dummies()
+
+    def _plan_dummies(self):
+        """
+        The get_dummies + align result, planned once: which model column each numeric input fills and
+        which one each category level sets to 1. Scoring then writes the matrix directly.
+        """
+        index = {f: j for j, f in enumerate(self.model.feature_names)}
+        self.plan_numeric = [c for c in self.numeric if c in index]
+        self.plan_numeric_idx = [index[c] for c in self.plan_numeric]
+        categories = sorted((c for c, kind in self.schema.items() if kind == "category"), key=len, reverse=True)
+        self.plan_levels = {}  # column → {level: model column index}
+        for f, j in index.items():
+            if f in self.schema:
+                continue
+            col = next((c for c in categories if f.startswith(c + "_")), None)  # longest matching column name
+            if col is not None:
+                self.plan_levels.setdefault(col, {})[f[len(col) + 1:]] = j
+
+    def check(self, records):
+        """
+        Required inputs each record lacks. ValueError for a value that is not a single value (list, object)
+        in any field, or not numeric in a numeric input.
+        """
+        for i, r in enumerate(records):
+            for c, v in r.items():
+                if not (v is None or isinstance(v, (bool, int, float, str))):
+                    raise ValueError(f"record {i}: {c}={v!r} is not a single value")
+            for c in self.numeric:
+                v = r.get(c)
+                if v is None or isinstance(v, (bool, int, float)):
+                    continue
+                try:
+                    float(v)
+                except (TypeError, ValueError):
+                    raise ValueError(f"record {i}: {c}={v!r} is not numeric") from None
+        return [[c for c in self.required if c not in r] for r in records]
+
+    def example(self):
+        """One all-zero record with every model input, for the warm-up call"""
+        columns = list(self.schema) or list(getattr(self.model, "feature_names", None) or self.model.feature_names_in_)
+        return pd.DataFrame([dict.fromkeys(columns, 0)])
+
+    def encode(self, df):
+        """Imputer fills, then one-hot + column alignment (forest) or raw columns (boosting bins them itself)"""
+        if self.imputer is not None:
+            needed = set(self.imputer.targets_) | set(getattr(self.imputer, "features_", []))
+            for keys, _ in self.imputer.group_medians_:
+                needed |= set(keys)
+            df = df.assign(**{c: np.nan for c in needed if c not in df.columns})
+            df = self.imputer.transform(df, n_jobs=1)
+        if not isinstance(self.model, IncrementalForest):
+            return df
+        if not self.schema:
+            # no drop_first here: a dropped baseline level is simply absent from feature_names, i.e. all zeros
+            return self.model.align(pd.get_dummies(df.fillna(0)))
+        # same values as fillna(0) + get_dummies + align, without building and reindexing the dummy frame
+        X = np.zeros((len(df), len(self.model.feature_names)))
+        numeric = to_float(df.reindex(columns=self.plan_numeric))
+        numeric[np.isnan(numeric)] = 0
+        X[:, self.plan_numeric_idx] = numeric
+        for col, levels in self.plan_levels.items():
+            values = df[col] if col in df.columns else pd.Series(np.nan, index=df.index)
+            j = values.fillna(0).astype(str).map(levels).to_numpy(dtype=float)
+            rows = np.flatnonzero(~np.isnan(j))  # unseen levels have no model column, as after align()
+            X[rows, j[rows].astype(int)] = 1
+        return pd.DataFrame(X, columns=self.model.feature_names)
+
+    def migration_types(self, df):
+        """P(Migrate_k = 1) from the logit coefficients; NaN where a ratio input is missing"""
+        out = {}
+        for outcome, m in self.logits["models"].items():
+            z = np.full(len(df), m["intercept"])
+            for name, coef in zip(m["features"], m["coef"]):
+                after, before = self.logits["ratios"][name]
+                if after not in df.columns or before not in df.columns:
+                    z[:] = np.nan
+                    break
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    z += coef * (pd.to_numeric(df[after], errors="coerce").to_numpy(dtype=float)
+                                 / pd.to_numeric(df[before], errors="coerce").to_numpy(dtype=float))
+            out[outcome] = 1 / (1 + np.exp(-np.clip(z, -30, 30)))
+        return out
+
+    def score(self, df, top_k=3):
+        """One vectorized pass over all rows; returns one JSON-ready dict per row"""
+        proba = self.model.predict_proba(self.encode(df))
+        top = np.argsort(-proba, axis=1)[:, :top_k]
+        types = self.migration_types(df) if self.logits else {}
+        rows = []
+        for i in range(len(df)):
+            dest = []
+            for j in top[i]:
+                code = str(self.classes[j])
+                dest.append({"pro_code": code, "name": province_name(code), "proba": round(float(proba[i, j]), 6)})
+            row = {"destination": dest}
+            if types:
+                row["migration_type"] = {k: (None if np.isnan(v[i]) else round(float(v[i]), 6))
+                                         for k, v in types.items()}
+            rows.append(row)
+        return rows
+
+
+# ==== 2) Micro-batching ====
+class MicroBatcher:
+    """
+    Requests are queued; one worker drains the queue until `max_batch` rows are collected or
+    `max_wait_ms` has passed since the first one, scores them in a single call and hands the
+    slices back. Concurrent clients therefore share one predict_proba call instead of queuing for the model.
+    """
+
+    def __init__(self, scorer, metrics, max_batch=512, max_wait_ms=5.0, top_k=3):
+        self.scorer = scorer
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.top_k = top_k
+        self.queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, records):
+        future = Future()
+        self.queue.put((records, future))
+        return future
+
+    def _collect(self):
+        items = [self.queue.get()]
+        n = len(items[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while n < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+            n += len(items[-1][0])
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            start = time.perf_counter()
+            try:
+                frame = pd.DataFrame([r for records, _ in items for r in records])
+                rows = self.scorer.score(frame, top_k=self.top_k)
+            except Exception:
+                # one malformed request must not fail the others batched with it: score them one by one
+                for records, future in items:
+                    try:
+                        future.set_result(self.scorer.score(pd.DataFrame(records), top_k=self.top_k))
+                    except Exception as e:
+                        future.set_exception(e)
+                self.metrics.batch(time.perf_counter() - start)
+                continue
+            self.metrics.batch(time.perf_counter() - start)
+            offset = 0
+            for records, future in items:
+                future.set_result(rows[offset:offset + len(records)])
+                offset += len(records)
+
+
+# ==== 3) Latency / throughput metrics ====
+class Metrics:
+    def __init__(self, window=2000):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.latencies = deque(maxlen=window)  # seconds, last `window` requests
+        self.recent = deque(maxlen=window)  # (finish time, rows)
+        self.requests = self.rows = self.batches = self.errors = 0
+        self.model_seconds = 0.0
+
+    def request(self, seconds, rows, ok=True):
+        with self.lock:
+            self.requests += 1
+            self.errors += not ok
+            if ok:
+                self.rows += rows
+                self.latencies.append(seconds)
+                self.recent.append((time.time(), rows))
+
+    def batch(self, seconds):
+        with self.lock:
+            self.batches += 1
+            self.model_seconds += seconds
+
+    def snapshot(self):
+        with self.lock:
+            lat = np.array(self.latencies) * 1000
+            now = time.time()
+            last_min = sum(r for t, r in self.recent if now - t <= 60)
+            uptime = now - self.started
+            return {
+                "uptime_s": round(uptime, 1),
+                "requests": self.requests,
+                "errors": self.errors,
+                "rows": self.rows,
+                "batches": self.batches,
+                "rows_per_batch": round(self.rows / self.batches, 2) if self.batches else None,
+                "latency_ms": {f"p{q}": round(float(np.percentile(lat, q)), 2) for q in (50, 95, 99)} if len(lat) else {},
+                "model_ms_per_batch": round(self.model_seconds * 1000 / self.batches, 2) if self.batches else None,
+                "rows_per_s": round(self.rows / uptime, 2) if uptime else None,
+                "rows_per_s_last_60s": round(last_min / min(60, uptime), 2) if uptime else None,
+            }
+
+
+# ==== 4) HTTP interface ====
+class Handler(BaseHTTPRequestHandler):
+    """POST /predict {"records": [{...}, ...]} or a single record; GET /metrics; GET /health"""
+    batcher = metrics = None
+    timeout_s = 10
+    quiet = True
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send(200, self.metrics.snapshot())
+        elif self.path == "/health":
+            self._send(200, {"status": "ok"})
+        else:
+            self._send(404, {"error": "unknown path"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send(404, {"error": "unknown path"})
+            return
+        start = time.perf_counter()
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            records = payload.get("records", [payload]) if isinstance(payload, dict) else payload
+            if not isinstance(records, list) or not records or not all(isinstance(r, dict) for r in records):
+                raise ValueError("expected a record object or {\"records\": [objects]}")
+            missing = self.batcher.scorer.check(records)
+        except (ValueError, TypeError) as e:
+            self.metrics.request(0, 0, ok=False)
+            self._send(400, {"error": str(e)})
+            return
+        try:
+            rows = self.batcher.submit(records).result(timeout=self.timeout_s)
+        except Exception as e:
+            self.metrics.request(time.perf_counter() - start, 0, ok=False)
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        for row, lacking in zip(rows, missing):
+            if lacking:
+                row["missing_features"] = lacking  # scored with the training fill (0 or imputed)
+        elapsed = time.perf_counter() - start
+        self.metrics.request(elapsed, len(records))
+        self._send(200, {"predictions": rows, "latency_ms": round(elapsed * 1000, 2)})
+
+    def log_message(self, fmt, *args):
+        if not self.quiet:
+            super().log_message(fmt, *args)
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # dozens of clients connect at once; the default backlog of 5 resets them
+
+
+def serve(scorer, host="127.0.0.1", port=8000, max_batch=512, max_wait_ms=5.0, top_k=3, quiet=True):
+    metrics = Metrics()
+    Handler.metrics = metrics
+    Handler.batcher = MicroBatcher(scorer, metrics, max_batch=max_batch, max_wait_ms=max_wait_ms, top_k=top_k)
+    Handler.quiet = quiet
+    scorer.score(scorer.example())  # warm-up: the first predict call pays for lazy initialization
+    return ScoringServer((host, port), Handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local batched scoring service for destination and migration type")
+    parser.add_argument("--model", default="2008before_rf_model.joblib", help="forest saved by random_forest.py")
+    parser.add_argument("--imputer", default=None, help="override the imputer recorded in the model")
+    parser.add_argument("--logits", default="logit_models.json", help="saved by logit_inference.py (optional)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=512, help="rows scored per model call at most")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="how long a batch waits for more requests")
+    parser.add_argument("--top-k", type=int, default=3, help="destinations returned per record")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scorer = Scorer(args.model, args.imputer, args.logits)
+    print(f"✔ Loaded {args.model}" + (f", {scorer.imputer_path}" if scorer.imputer else "")
+          + (f", {args.logits}" if scorer.logits else "") + f" in {time.perf_counter() - start:.1f}s")
+    server = serve(scorer, args.host, args.port, args.max_batch, args.max_wait_ms, args.top_k, quiet=not args.verbose)
+    print(f"Serving on http://{args.host}:{args.port}  (POST /predict, GET /metrics, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,80 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+
+def reservoir_merge(reservoir, new_rows, size, seed=None, strata=None):
+    """
+    Uniform reservoir over all rows ever seen: every row carries a random key and the `size`
+    rows with the smallest keys are kept (per stratum if `strata` columns are given), so
+    merging chunks or waves is exact and independent of their order.
+    size: one cap for every stratum, or {value of the first strata column: cap} to cap only some classes
+    """
+    rng = np.random.default_rng(seed)
+    new_rows = new_rows.copy()
+    new_rows["_key"] = rng.random(len(new_rows))
+    pool = new_rows if reservoir is None or reservoir.empty else pd.concat([reservoir, new_rows], ignore_index=True)
+    if strata is None:
+        if len(pool) <= size:
+            return pool.reset_index(drop=True)
+        keep = np.argpartition(pool["_key"].to_numpy(), size - 1)[:size]
+        return pool.iloc[np.sort(keep)].reset_index(drop=True)
+
+    pool = pool.sort_values("_key", kind="stable")
+    rank = pool.groupby(strata, dropna=False, sort=False).cumcount()
+    if isinstance(size, dict):
+        caps = pool[strata[0]].map(size).fillna(np.inf)  # strata without a cap are kept whole
+    else:
+        caps = size
+    return pool[rank < caps].sort_index().reset_index(drop=True)
+
+
+def stratified_sample(source, strata=("pro_code", "year"), cap=20_000, chunksize=500_000, seed=42, usecols=None):
+    """
+    One streaming pass over a panel CSV (or a DataFrame): keep at most `cap` rows per stratum
+    with a per-stratum reservoir, count every stratum, and attach the inverse inclusion
+    probability as `_weight` (stratum rows seen / stratum rows kept).
+    """
+    strata = list(strata)
+    if isinstance(source, pd.DataFrame):
+        chunks = (source.iloc[i:i + chunksize] for i in range(0, len(source), chunksize))
+    else:
+        chunks = pd.read_csv(source, chunksize=chunksize, usecols=usecols, low_memory=False)
+
+    sample, counts = None, None
+    for k, chunk in enumerate(chunks):
+        # a different seed per chunk so keys stay independent across chunks
+        sample = reservoir_merge(sample, chunk, cap, seed=seed + k, strata=strata)
+        n = chunk.groupby(strata, dropna=False).size()
+        counts = n if counts is None else counts.add(n, fill_value=0)
+
+    kept = sample.groupby(strata, dropna=False).size()
+    weight = (counts / kept).rename("_weight").reset_index()
+    sample = sample.merge(weight, on=strata, how="left").drop(columns="_key")
+    return sample
+
+
+def balanced_weights(y, weights):
+    """
+    class_weight="balanced" on the weighted population: every class gets the same total weight,
+    computed from the weighted class counts (sklearn's "balanced" counts sampled rows, which
+    combined with the sampling weights restores the population class mix).
+    """
+    y = np.asarray(y)
+    totals = pd.Series(weights).groupby(y).sum()
+    factor = totals.sum() / (len(totals) * totals)
+    return np.asarray(weights) * factor.reindex(y).to_numpy()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stratum capped sample of the panel with sampling weights")
+    parser.add_argument("panel", help="panel CSV, e.g. panel_data/2008before.csv")
+    parser.add_argument("-o", "--output", default="panel_sample.csv")
+    parser.add_argument("--cap", type=int, default=20_000, help="maximum rows kept per stratum")
+    parser.add_argument("--strata", nargs="+", default=["pro_code", "year"])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sample = stratified_sample(args.panel, strata=args.strata, cap=args.cap, seed=args.seed)
+    sample.to_csv(args.output, index=False, encoding="utf-8-sig")
+    print(f"✔ {len(sample)} rows (represent {sample['_weight'].sum():.0f}) saved to: {args.output}")